@@ -0,0 +1,83 @@
+# src/daemon.py
+"""
+Long-running mode: run pipeline stages on their own intervals in one
+process, so the scorer, connections and caches stay warm between runs.
+
+    python -m src.main --daemon --scrape-every 3600 --score-every 300
+
+Stages run one at a time on the calling thread and therefore never
+overlap; a stage that comes due while another is running waits for it.
+A stage that falls behind is not replayed for every interval it missed.
+SIGTERM or SIGINT lets the running stage finish (stages check
+Daemon.stopping to wind down early), then the loop exits.
+"""
+from __future__ import annotations
+import signal
+import threading
+import time
+import traceback
+from typing import Any, Callable, Sequence
+
+# seconds between runs of each stage; 0 disables a stage
+DEFAULT_INTERVALS: dict[str, float] = {
+    "scrape": 3600.0,
+    "score": 300.0,
+    "aggregate": 600.0,
+    "plot": 1800.0,
+}
+
+
+class Stage:
+    __slots__ = ("name", "interval", "run", "next_due")
+
+    def __init__(self, name: str, interval: float, run: Callable[[], Any], next_due: float) -> None:
+        self.name = name
+        self.interval = interval
+        self.run = run
+        self.next_due = next_due
+
+
+class Daemon:
+    """Runs (name, interval, callable) stages until stopped."""
+
+    def __init__(self, stages: Sequence[tuple[str, float, Callable[[], Any]]]) -> None:
+        now = time.monotonic()
+        self.stages = [Stage(name, interval, run, now) for name, interval, run in stages if interval > 0]
+        self.stopping = threading.Event()
+
+    def stop(self, signum: int | None = None, frame: Any = None) -> None:
+        if signum is not None:
+            print(f"\nReceived {signal.Signals(signum).name}, stopping after the current stage…")
+        self.stopping.set()
+
+    def install_signal_handlers(self) -> None:
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+
+    def run(self) -> None:
+        if not self.stages:
+            print("No stages enabled")
+            return
+        print("Daemon running: " + ", ".join(f"{s.name} every {s.interval:g}s" for s in self.stages))
+        while not self.stopping.is_set():
+            # earliest due stage; ties go to the order stages were given in
+            stage = min(self.stages, key=lambda s: s.next_due)
+            delay = stage.next_due - time.monotonic()
+            if delay > 0:
+                self.stopping.wait(delay)
+                continue
+
+            started = time.monotonic()
+            print(f"\n[{time.strftime('%Y-%m-%d %H:%M:%S')}] {stage.name}…")
+            try:
+                stage.run()
+            except Exception:
+                # one failed run must not take the daemon down
+                traceback.print_exc()
+            finished = time.monotonic()
+            print(f"{stage.name} finished in {finished - started:.1f}s")
+
+            stage.next_due += stage.interval
+            if stage.next_due <= finished:
+                stage.next_due = finished + stage.interval
+        print("Daemon stopped")
@@ -2,6 +2,96 @@
 import sqlite3
 import os
 
+from src.processing.sampling import rebuild_sample
+
+def create_post_tables(cur):
+    """
+    Creates the post, per-target sentiment, sample and rollup tables if they do not exist.
+    Used for the main database and for every monthly shard file.
+    """
+    # Create Reddit posts table with foreign key reference
+    cur.execute('''
+        CREATE TABLE IF NOT EXISTS reddit_posts (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER NOT NULL,
+            account_id TEXT NOT NULL,
+            account_name TEXT NOT NULL,
+            post_date TIMESTAMP NOT NULL,
+            text_content TEXT NOT NULL,
+            is_reply BOOLEAN NOT NULL,
+            subreddit TEXT,
+            upvotes INTEGER,
+            trump_sentiment INTEGER,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (user_id) REFERENCES reddit_users(id)
+        )
+    ''')
+
+    # Create Instagram posts table
+    cur.execute('''
+        CREATE TABLE IF NOT EXISTS instagram_posts (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            post_id TEXT NOT NULL,
+            username TEXT NOT NULL,
+            caption TEXT,
+            post_date TIMESTAMP NOT NULL,
+            likes_count INTEGER,
+            comments_count INTEGER,
+            url TEXT,
+            trump_sentiment INTEGER,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+
+    # Index the columns the scrapers deduplicate on
+    cur.execute('CREATE INDEX IF NOT EXISTS idx_reddit_posts_account_id ON reddit_posts (account_id)')
+    cur.execute('CREATE INDEX IF NOT EXISTS idx_instagram_posts_post_id ON instagram_posts (post_id)')
+
+    # Create per-target sentiment table (one row per post and target)
+    cur.execute('''
+        CREATE TABLE IF NOT EXISTS post_sentiment (
+            platform TEXT NOT NULL,
+            post_id INTEGER NOT NULL,
+            target TEXT NOT NULL,
+            score INTEGER,
+            PRIMARY KEY (platform, post_id, target)
+        ) WITHOUT ROWID
+    ''')
+
+    # Create stratified sample tables for approximate queries:
+    # posts ingested per (platform, month) and the sampled post ids
+    cur.execute('''
+        CREATE TABLE IF NOT EXISTS sample_strata (
+            platform TEXT NOT NULL,
+            month TEXT NOT NULL,
+            population INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (platform, month)
+        ) WITHOUT ROWID
+    ''')
+    cur.execute('''
+        CREATE TABLE IF NOT EXISTS sentiment_sample (
+            platform TEXT NOT NULL,
+            month TEXT NOT NULL,
+            post_id INTEGER NOT NULL,
+            PRIMARY KEY (platform, month, post_id)
+        ) WITHOUT ROWID
+    ''')
+
+    # Create rollup table for posts moved to the archive: posts per
+    # (platform, day, account month, target, score); target '' is the
+    # overall score and account_month '' an unknown or non-Reddit account
+    cur.execute('''
+        CREATE TABLE IF NOT EXISTS sentiment_rollup (
+            platform TEXT NOT NULL,
+            day TEXT NOT NULL,
+            account_month TEXT NOT NULL,
+            target TEXT NOT NULL,
+            score INTEGER NOT NULL,
+            posts INTEGER NOT NULL,
+            PRIMARY KEY (platform, day, account_month, target, score)
+        ) WITHOUT ROWID
+    ''')
+
 def create_tables(db_path='data/project.db'):
     """
     Creates tables at startup if they do not exist.
@@ -29,41 +119,35 @@ def create_tables(db_path='data/project.db'):
         ''')
         print("Created reddit_users table")
 
-        # Create Reddit posts table with foreign key reference
-        cur.execute('''
-            CREATE TABLE IF NOT EXISTS reddit_posts (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                user_id INTEGER NOT NULL,
-                account_id TEXT NOT NULL,
-                account_name TEXT NOT NULL,
-                post_date TIMESTAMP NOT NULL,
-                text_content TEXT NOT NULL,
-                is_reply BOOLEAN NOT NULL,
-                subreddit TEXT,
-                upvotes INTEGER,
-                trump_sentiment INTEGER,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (user_id) REFERENCES reddit_users(id)
-            )
-        ''')
-        print("Created reddit_posts table")
+        # Create the post tables (shared with the monthly shard files)
+        create_post_tables(cur)
+        print("Created reddit_posts, instagram_posts, post_sentiment, sample and rollup tables")
 
-        # Create Instagram posts table
+        # Create table of dedup keys of archived posts, so scrapers skip them
         cur.execute('''
-            CREATE TABLE IF NOT EXISTS instagram_posts (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                post_id TEXT NOT NULL,
-                username TEXT NOT NULL,
-                caption TEXT,
-                post_date TIMESTAMP NOT NULL,
-                likes_count INTEGER,
-                comments_count INTEGER,
-                url TEXT,
-                trump_sentiment INTEGER,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
+            CREATE TABLE IF NOT EXISTS archived_keys (
+                platform TEXT NOT NULL,
+                key TEXT NOT NULL,
+                PRIMARY KEY (platform, key)
+            ) WITHOUT ROWID
         ''')
-        print("Created instagram_posts table")
+
+        # Bring shard files created by older versions up to date
+        # (imported here: src.shards itself imports create_post_tables)
+        from src.shards import list_shards
+        for _, path in list_shards():
+            shard = sqlite3.connect(path)
+            try:
+                create_post_tables(shard.cursor())
+                shard.commit()
+            finally:
+                shard.close()
+
+        # Backfill the sample once for databases that predate it
+        cur.execute('SELECT 1 FROM sample_strata LIMIT 1')
+        if cur.fetchone() is None:
+            rebuild_sample(cur)
+            print("Built stratified sample from existing posts")
 
         conn.commit()
         print("Changes committed successfully")
@@ -1,5 +1,8 @@
 from __future__ import annotations
+import argparse
 import os
+import sqlite3
+import threading
 from dotenv import load_dotenv
 
 # Project
@@ -7,52 +10,206 @@ from src.database_setup import create_tables
 from src.scrapers.apify_instagram_scraper import InstagramScraper
 from src.scrapers.reddit_scraper        import ApifyRedditScraper
 
-from src.processing.sentiment_analyzer  import main as sentiment_main
-from src.processing.process_data        import main as process_data_main
+from src.processing.sentiment_analyzer  import (SentimentAnalyzer, main as sentiment_main,
+                                                main_prioritized, print_backlog_status)
+from src.processing.priority            import PriorityScheduler
+from src.processing.pipeline            import ScoringPipeline
+from src.processing.targets             import load_targets
+from src.shards                         import ShardRouter
+from src.processing.process_data        import DB_PATH, main as process_data_main
 from src.processing.user_age_analysis   import analyze_account_age_sentiment
+from src.maintenance                    import maintain
+from src.daemon                         import DEFAULT_INTERVALS, Daemon
+from src.service                        import write_watermark
 from visuals.plot_sentiment             import main as plot_sentiment_main
 
 # Scraper helper
-def run_scrapers() -> None:
-    """Scrape 25 fresh posts from each platform."""
-    insta = InstagramScraper()
-    reddit = ApifyRedditScraper()
+def run_scrapers(stream: bool = False, pipeline: ScoringPipeline | None = None,
+                 shards: bool = False, stop: threading.Event | None = None) -> None:
+    """
+    Scrape 25 fresh posts from each platform, optionally streaming the
+    datasets, handing new posts to a scoring pipeline and storing them in
+    monthly shard files. Setting stop cuts the scrape short, keeping the
+    posts inserted so far.
+    """
+    router = ShardRouter() if shards else None
+    insta = InstagramScraper(pipeline=pipeline, shards=router, stop=stop)
+    reddit = ApifyRedditScraper(pipeline=pipeline, shards=router, stop=stop)
     try:
         print("\n Scraping Instagram (#trump)…")
-        insta.scrape_hashtag_posts(hashtag="trump", api_limit=150, db_limit=25)
+        insta.scrape_hashtag_posts(hashtag="trump", api_limit=150, db_limit=25, stream=stream)
+        if stop is not None and stop.is_set():
+            return
 
         print("\n Scraping Reddit (Donald Trump)…")
-        reddit.scrape_posts(search_term="Donald Trump", api_limit=150, db_limit=25)
+        reddit.scrape_posts(search_term="Donald Trump", api_limit=150, db_limit=25, stream=stream)
     finally:
         insta.close()
         reddit.close()
+        if router:
+            router.close()
 
 # Main
-def main() -> None:
+def run_pipelined(stream: bool = False, shards: bool = False) -> None:
+    """Scrape and score in one pass: posts are scored as they are inserted."""
+    analyzer = SentimentAnalyzer()
+    pipeline = ScoringPipeline(analyzer)
+    try:
+        run_scrapers(stream=stream, pipeline=pipeline, shards=shards)
+    finally:
+        analyzer.close()
+    print(f"\nScored {pipeline.scored} posts while scraping")
+
+def main(stream: bool = False, pipelined: bool = False, approximate: bool = False,
+         shards: bool = False, start: str | None = None, end: str | None = None,
+         prioritized: bool = False, max_rows: int | None = None,
+         max_seconds: float | None = None, maintenance: bool = False,
+         retention_days: int | None = None) -> None:
     load_dotenv()
     create_tables()
 
-    # scrape
-    run_scrapers()
+    if pipelined:
+        # scrape and sentiment score together
+        run_pipelined(stream=stream, shards=shards)
+    else:
+        # scrape
+        run_scrapers(stream=stream, shards=shards)
 
-    # sentiment score
+    # sentiment score whatever is still pending: everything new, or with
+    # --pipelined older posts missing a newly configured target and posts
+    # whose scoring failed
     print("\nSentiment analysis…")
-    sentiment_main()
+    if prioritized:
+        main_prioritized(max_rows=max_rows, max_seconds=max_seconds)
+    else:
+        sentiment_main()
 
     # account age analysis
     print("\nAnalyzing account age and sentiment…")
-    analyze_account_age_sentiment()
+    analyze_account_age_sentiment(approximate=approximate, start=start, end=end)
+    for target in load_targets():
+        analyze_account_age_sentiment(target, approximate=approximate, start=start, end=end)
 
     # generate calculation files
     print("\nBuilding calculation files…")
-    process_data_main()
+    process_data_main(approximate=approximate, start=start, end=end)
 
     # create plots
     print("\nRendering plots…")
     plot_sentiment_main()
 
+    # archive, compact and optimize the databases
+    if maintenance:
+        print("\nRunning database maintenance…")
+        maintain(retention_days)
+
     print("\nDone! Check the data/ and visuals/ folders")
 
+# Daemon
+def run_daemon(intervals: dict[str, float], stream: bool = False, shards: bool = False,
+               approximate: bool = False, start: str | None = None, end: str | None = None,
+               max_rows: int | None = None, max_seconds: float | None = None) -> None:
+    """
+    Scrape, score, aggregate and plot on their own intervals in one process
+    (see src.daemon). The analyzer (TextBlob corpora and score cache) and a
+    read connection stay open throughout; aggregation is skipped while the
+    databases are unchanged and plotting while no new files were written.
+    """
+    load_dotenv()
+    create_tables()
+
+    analyzer = SentimentAnalyzer()
+    read_conn = sqlite3.connect(DB_PATH)
+    state = {"watermark": None, "version": 0, "plotted": None}
+
+    def scrape() -> None:
+        run_scrapers(stream=stream, shards=shards, stop=daemon.stopping)
+
+    def score() -> None:
+        # shards can appear between runs, so the scheduler is rebuilt each time
+        scheduler = PriorityScheduler(analyzer)
+        try:
+            scored = scheduler.run(max_rows=max_rows, max_seconds=max_seconds, stop=daemon.stopping)
+            print(f"Scored {scored} posts")
+            print_backlog_status(scheduler.status())
+        finally:
+            scheduler.close()
+
+    def aggregate() -> None:
+        watermark = write_watermark()
+        if watermark == state["watermark"]:
+            print("No database changes since the last aggregation")
+            return
+        analyze_account_age_sentiment(approximate=approximate, start=start, end=end, conn=read_conn)
+        for target in load_targets():
+            analyze_account_age_sentiment(target, approximate=approximate, start=start, end=end,
+                                          conn=read_conn)
+        process_data_main(approximate=approximate, start=start, end=end, conn=read_conn)
+        state["watermark"] = watermark
+        state["version"] += 1
+
+    def plot() -> None:
+        if intervals["aggregate"] > 0 and state["plotted"] == state["version"]:
+            print("No new calculation files since the last plot")
+            return
+        plot_sentiment_main()
+        state["plotted"] = state["version"]
+
+    daemon = Daemon([
+        ("scrape", intervals["scrape"], scrape),
+        ("score", intervals["score"], score),
+        ("aggregate", intervals["aggregate"], aggregate),
+        ("plot", intervals["plot"], plot),
+    ])
+    daemon.install_signal_handlers()
+    try:
+        daemon.run()
+    finally:
+        analyzer.close()
+        read_conn.close()
+
 # ───────────────────────────────────────────────────────────────────────────
+def parse_args(argv: list[str] | None = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Scrape, score, aggregate and plot post sentiment.")
+    parser.add_argument("--stream", action="store_true",
+                        help="stream API datasets as JSONL instead of loading them whole")
+    parser.add_argument("--pipelined", action="store_true",
+                        help="score posts as they are inserted; a second pass only scores what is still pending")
+    parser.add_argument("--approximate", action="store_true",
+                        help="compute aggregates from the stratified sample, with confidence intervals")
+    parser.add_argument("--shards", action="store_true",
+                        help="store new posts in per-month shard files under data/shards")
+    parser.add_argument("--start", metavar="YYYY-MM-DD",
+                        help="only aggregate posts on or after this date")
+    parser.add_argument("--end", metavar="YYYY-MM-DD",
+                        help="only aggregate posts on or before this date")
+    parser.add_argument("--prioritized", action="store_true",
+                        help="score the backlog by engagement and recency, highest first")
+    parser.add_argument("--max-rows", type=int, metavar="N",
+                        help="with --prioritized or --daemon, score at most N posts per run")
+    parser.add_argument("--max-seconds", type=float, metavar="S",
+                        help="with --prioritized or --daemon, stop each scoring run after S seconds")
+    parser.add_argument("--maintain", action="store_true",
+                        help="after the run, compact/optimize the databases")
+    parser.add_argument("--retention-days", type=int, metavar="DAYS",
+                        help="with --maintain, also archive scored posts older than DAYS; every such "
+                             "post leaves the live databases (with 365 that is all of the shipped "
+                             "data/project.db), so later --compare-normalization runs find none")
+    parser.add_argument("--daemon", action="store_true",
+                        help="keep running and repeat each stage on its own interval")
+    for stage, interval in DEFAULT_INTERVALS.items():
+        parser.add_argument(f"--{stage}-every", type=float, default=interval, metavar="SECONDS",
+                            help=f"with --daemon, seconds between {stage} runs; 0 disables (default {interval:g})")
+    return parser.parse_args(argv)
+
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    args = parse_args()
+    if args.daemon:
+        intervals = {stage: getattr(args, f"{stage}_every") for stage in DEFAULT_INTERVALS}
+        run_daemon(intervals, stream=args.stream, shards=args.shards, approximate=args.approximate,
+                   start=args.start, end=args.end, max_rows=args.max_rows, max_seconds=args.max_seconds)
+    else:
+        main(stream=args.stream, pipelined=args.pipelined, approximate=args.approximate,
+             shards=args.shards, start=args.start, end=args.end,
+             prioritized=args.prioritized, max_rows=args.max_rows, max_seconds=args.max_seconds,
+             maintenance=args.maintain, retention_days=args.retention_days)
\ No newline at end of file
@@ -0,0 +1,327 @@
+# src/maintenance.py
+"""
+Database maintenance: retention, compaction and planner statistics.
+
+    python -m src.maintenance --retention-days 365
+
+1. Scored posts older than the retention window are moved, zlib-compressed,
+   into data/archive.db. Their scores are folded into sentiment_rollup
+   first, so every aggregate still counts them, and their dedup keys go
+   to archived_keys so the scrapers do not ingest them again.
+2. Freed pages are handed back with incremental vacuum; the first run
+   switches each database to auto_vacuum=INCREMENTAL with a one-off VACUUM.
+3. ANALYZE on the first run, PRAGMA optimize afterwards.
+
+The main database and every shard are maintained, except shard files
+that are read-only (old months may be made so); a shard that fails with
+an SQLite error is rolled back and reported without stopping the run.
+The report lists the bytes reclaimed per file, the skipped shards and the
+aggregate query timings before and after.
+"""
+from __future__ import annotations
+import argparse
+import json
+import os
+import sqlite3
+import time
+import zlib
+from datetime import date, timedelta
+from pathlib import Path
+from typing import Any, Callable
+
+from src.database_setup import create_tables
+from src.processing.process_data import BUCKETS, DB_PATH, daily_series, load_groups
+from src.processing.targets import PLATFORMS
+from src.processing.user_age_analysis import account_age_summaries
+from src.shards import SHARD_DIR, attached, iter_schemas, list_shards, schema_name
+
+ARCHIVE_PATH: Path = DB_PATH.with_name("archive.db")
+
+# days of posts kept in the live databases
+RETENTION_DAYS: int = 365
+
+# posts table -> column the scrapers deduplicate on
+KEY_COLUMNS: dict[str, str] = {
+    "reddit_posts": "account_id",
+    "instagram_posts": "post_id",
+}
+
+# aggregate queries timed before and after maintenance
+TIMED_QUERIES: dict[str, Callable[[sqlite3.Connection], Any]] = {
+    "weekday": lambda conn: load_groups(conn.cursor(), {"platform": "platform",
+                                                         "weekday": "strftime('%w', post_date)"}),
+    "monthly": lambda conn: load_groups(conn.cursor(), {"month": BUCKETS["month"]}),
+    "daily": lambda conn: daily_series(conn.cursor()),
+    "account_age": lambda conn: account_age_summaries(conn),
+}
+
+
+def file_size(path: Path) -> int:
+    """Bytes used by a database file and its WAL/journal."""
+    total = 0
+    for suffix in ("", "-wal", "-journal"):
+        part = path.with_name(path.name + suffix)
+        if part.exists():
+            total += part.stat().st_size
+    return total
+
+
+def database_sizes() -> dict[str, int]:
+    paths = [DB_PATH, ARCHIVE_PATH] + [path for _, path in list_shards(shard_dir=SHARD_DIR)]
+    return {path.name: file_size(path) for path in paths}
+
+
+def read_only(path: Path) -> bool:
+    """Whether SQLite cannot write a database file (or a journal next to it)."""
+    return not (os.access(path, os.W_OK) and os.access(path.parent, os.W_OK))
+
+
+def time_queries(conn: sqlite3.Connection, repeat: int = 3) -> dict[str, float]:
+    """Best-of-repeat wall time in milliseconds of each aggregate query."""
+    timings = {}
+    for name, query in TIMED_QUERIES.items():
+        best = float("inf")
+        for _ in range(repeat):
+            started = time.perf_counter()
+            query(conn)
+            best = min(best, time.perf_counter() - started)
+        timings[name] = round(best * 1000, 2)
+    return timings
+
+
+def load_archived_post(payload: bytes) -> dict[str, Any]:
+    """Decode an archived_posts payload: {"post": {column: value}, "scores": {target: score}}."""
+    return json.loads(zlib.decompress(payload))
+
+
+# archival
+
+def create_archive(conn: sqlite3.Connection) -> None:
+    """Archive table, in the database attached as 'archive'."""
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS archive.archived_posts (
+            platform TEXT NOT NULL,
+            source TEXT NOT NULL,
+            post_id INTEGER NOT NULL,
+            post_date TIMESTAMP,
+            payload BLOB NOT NULL,
+            PRIMARY KEY (platform, source, post_id)
+        )
+    """)
+
+
+def archive_schema(conn: sqlite3.Connection, schema: str, cutoff: str) -> int:
+    """
+    Move the scored posts of one schema dated before cutoff ('YYYY-MM-DD')
+    to the archive, keeping their contribution in the schema's rollup.
+    Runs as one transaction. Returns the number of posts archived.
+    """
+    archived = 0
+    for table, platform in PLATFORMS.items():
+        conn.execute("DROP TABLE IF EXISTS temp.archiving")
+        conn.execute(f"""
+            CREATE TEMP TABLE archiving AS
+            SELECT id FROM {schema}.{table} p
+            WHERE date(p.post_date) < ? AND p.trump_sentiment IS NOT NULL
+        """, (cutoff,))
+        count = conn.execute("SELECT COUNT(*) FROM temp.archiving").fetchone()[0]
+        if count == 0:
+            continue
+
+        if table == "reddit_posts":
+            account_month = "COALESCE(strftime('%Y-%m', ru.account_created), '')"
+            user_join = "LEFT JOIN main.reddit_users ru ON ru.user_id = p.account_id"
+        else:
+            account_month = "''"
+            user_join = ""
+
+        # Fold overall and per-target scores into the rollup
+        conn.execute(f"""
+            INSERT INTO {schema}.sentiment_rollup (platform, day, account_month, target, score, posts)
+            SELECT ?, date(p.post_date) AS day, {account_month} AS account_month, '', p.trump_sentiment, COUNT(*)
+            FROM {schema}.{table} p
+            {user_join}
+            WHERE p.id IN (SELECT id FROM temp.archiving)
+            GROUP BY day, account_month, p.trump_sentiment
+            ON CONFLICT (platform, day, account_month, target, score)
+            DO UPDATE SET posts = posts + excluded.posts
+        """, (platform,))
+        conn.execute(f"""
+            INSERT INTO {schema}.sentiment_rollup (platform, day, account_month, target, score, posts)
+            SELECT ?, date(p.post_date) AS day, {account_month} AS account_month, s.target, s.score, COUNT(*)
+            FROM {schema}.{table} p
+            JOIN {schema}.post_sentiment s ON s.platform = ? AND s.post_id = p.id
+            {user_join}
+            WHERE p.id IN (SELECT id FROM temp.archiving) AND s.score IS NOT NULL
+            GROUP BY day, account_month, s.target, s.score
+            ON CONFLICT (platform, day, account_month, target, score)
+            DO UPDATE SET posts = posts + excluded.posts
+        """, (platform, platform))
+
+        # Compressed copy of every column and target score
+        columns = [row[1] for row in conn.execute(f"PRAGMA {schema}.table_info({table})")]
+        post_json = ", ".join(f"'{column}', p.{column}" for column in columns)
+        conn.execute(f"""
+            INSERT OR REPLACE INTO archive.archived_posts (platform, source, post_id, post_date, payload)
+            SELECT ?, ?, p.id, p.post_date,
+                   compress(json_object(
+                       'post', json_object({post_json}),
+                       'scores', json((SELECT json_group_object(s.target, s.score)
+                                       FROM {schema}.post_sentiment s
+                                       WHERE s.platform = ? AND s.post_id = p.id))))
+            FROM {schema}.{table} p
+            WHERE p.id IN (SELECT id FROM temp.archiving)
+        """, (platform, schema, platform))
+        conn.execute(f"""
+            INSERT OR IGNORE INTO main.archived_keys (platform, key)
+            SELECT ?, p.{KEY_COLUMNS[table]}
+            FROM {schema}.{table} p
+            WHERE p.id IN (SELECT id FROM temp.archiving)
+        """, (platform,))
+
+        # The sample keeps describing the live posts only
+        conn.execute(f"""
+            UPDATE {schema}.sample_strata
+            SET population = population - (
+                SELECT COUNT(*) FROM {schema}.{table} p
+                WHERE p.id IN (SELECT id FROM temp.archiving)
+                AND strftime('%Y-%m', p.post_date) = sample_strata.month)
+            WHERE platform = ?
+        """, (platform,))
+        conn.execute(f"DELETE FROM {schema}.sample_strata WHERE platform = ? AND population <= 0",
+                     (platform,))
+        conn.execute(f"""
+            DELETE FROM {schema}.sentiment_sample
+            WHERE platform = ? AND post_id IN (SELECT id FROM temp.archiving)
+        """, (platform,))
+
+        conn.execute(f"""
+            DELETE FROM {schema}.post_sentiment
+            WHERE platform = ? AND post_id IN (SELECT id FROM temp.archiving)
+        """, (platform,))
+        conn.execute(f"DELETE FROM {schema}.{table} WHERE id IN (SELECT id FROM temp.archiving)")
+        archived += count
+
+    conn.execute("DROP TABLE IF EXISTS temp.archiving")
+    conn.commit()
+    return archived
+
+
+# compaction and statistics
+
+def compact(conn: sqlite3.Connection, schema: str) -> None:
+    """Return free pages to the filesystem (one full VACUUM the first time)."""
+    if conn.execute(f"PRAGMA {schema}.auto_vacuum").fetchone()[0] != 2:
+        conn.execute(f"PRAGMA {schema}.auto_vacuum = INCREMENTAL")
+        conn.execute(f"VACUUM {schema}")
+    else:
+        conn.execute(f"PRAGMA {schema}.incremental_vacuum").fetchall()
+
+
+def optimize(conn: sqlite3.Connection, schema: str) -> None:
+    """Full ANALYZE when there are no statistics yet, else PRAGMA optimize."""
+    has_stats = conn.execute(
+        f"SELECT 1 FROM {schema}.sqlite_master WHERE name = 'sqlite_stat1'").fetchone()
+    if has_stats:
+        conn.execute(f"PRAGMA {schema}.optimize").fetchall()
+    else:
+        conn.execute(f"ANALYZE {schema}")
+    conn.commit()
+
+
+def maintain(retention_days: int | None = RETENTION_DAYS) -> dict[str, Any]:
+    """
+    Archive posts older than retention_days (None skips archival), compact
+    and optimize every database. Prints and returns the report.
+    """
+    sizes_before = database_sizes()
+    conn = sqlite3.connect(DB_PATH)
+    conn.create_function("compress", 1, lambda text: zlib.compress(text.encode("utf-8")),
+                         deterministic=True)
+    try:
+        timings_before = time_queries(conn)
+
+        # schema -> why it was left alone
+        skipped: dict[str, str] = {
+            schema_name(month): "read-only"
+            for month, path in list_shards(shard_dir=SHARD_DIR) if read_only(path)
+        }
+
+        archived: dict[str, int] = {}
+        cutoff = None
+        if retention_days is not None:
+            cutoff = (date.today() - timedelta(days=retention_days)).isoformat()
+            with attached(conn, ARCHIVE_PATH, "archive"):
+                create_archive(conn)
+                conn.commit()
+                for schema in iter_schemas(conn, end=cutoff, shard_dir=SHARD_DIR):
+                    if schema in skipped:
+                        continue
+                    try:
+                        archived[schema] = archive_schema(conn, schema, cutoff)
+                    except sqlite3.OperationalError as e:
+                        conn.rollback()
+                        skipped[schema] = str(e)
+
+        for schema in iter_schemas(conn, shard_dir=SHARD_DIR):
+            if schema in skipped:
+                continue
+            try:
+                compact(conn, schema)
+                optimize(conn, schema)
+            except sqlite3.OperationalError as e:
+                conn.rollback()
+                skipped[schema] = str(e)
+
+        timings_after = time_queries(conn)
+    finally:
+        conn.close()
+    sizes_after = database_sizes()
+
+    report = {
+        "cutoff": cutoff,
+        "archived": {schema: count for schema, count in archived.items() if count},
+        "skipped": skipped,
+        "bytes": {
+            name: {"before": sizes_before.get(name, 0), "after": size}
+            for name, size in sizes_after.items()
+        },
+        "timings_ms": {
+            name: {"before": timings_before[name], "after": timings_after[name]}
+            for name in TIMED_QUERIES
+        },
+    }
+    print_report(report)
+    return report
+
+
+def print_report(report: dict[str, Any]) -> None:
+    if report["cutoff"] is not None:
+        total = sum(report["archived"].values())
+        per_schema = ", ".join(f"{schema}: {count}" for schema, count in report["archived"].items())
+        print(f"Archived {total} posts dated before {report['cutoff']}"
+              + (f" ({per_schema})" if per_schema else ""))
+    for schema, reason in report["skipped"].items():
+        print(f"Skipped {schema}: {reason}")
+    reclaimed = 0
+    for name, sizes in report["bytes"].items():
+        delta = sizes["before"] - sizes["after"]
+        if name != ARCHIVE_PATH.name:
+            reclaimed += delta
+        print(f"{name}: {sizes['before']:,} -> {sizes['after']:,} bytes")
+    print(f"Reclaimed {reclaimed:,} bytes from the live databases")
+    print("Query timings (ms, before -> after):")
+    for name, timing in report["timings_ms"].items():
+        print(f"  {name}: {timing['before']} -> {timing['after']}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Archive old posts, compact and optimize the databases.")
+    parser.add_argument("--retention-days", type=int, default=RETENTION_DAYS,
+                        help=f"archive scored posts older than this many days (default {RETENTION_DAYS}); "
+                             "on a database of older posts that is every post, leaving none live")
+    parser.add_argument("--no-archive", action="store_true",
+                        help="only compact and optimize")
+    args = parser.parse_args()
+    create_tables(str(DB_PATH))
+    maintain(None if args.no_archive else args.retention_days)
@@ -0,0 +1,62 @@
+from __future__ import annotations
+from typing import Any, Iterable
+
+# sentiment scores are integers 0..100
+BINS: int = 101
+
+QUANTILES: dict[str, float] = {"p10": 0.10, "p50": 0.50, "p90": 0.90}
+
+
+class Histogram:
+    """
+    Fixed 101-bin histogram of 0-100 sentiment scores.
+
+    Mean and quantiles are read off the bins, so they cost the same
+    however many posts went into the histogram. Counts may be fractional
+    (weighted samples).
+    """
+    __slots__ = ("counts", "total")
+
+    def __init__(self, counts: Iterable[float] | None = None) -> None:
+        self.counts: list[float] = list(counts) if counts is not None else [0] * BINS
+        if len(self.counts) != BINS:
+            raise ValueError(f"Expected {BINS} bins, got {len(self.counts)}")
+        self.total: float = sum(self.counts)
+
+    def add(self, score: int, count: float = 1) -> None:
+        self.counts[max(0, min(BINS - 1, int(score)))] += count
+        self.total += count
+
+    def merge(self, other: Histogram) -> None:
+        for score, count in enumerate(other.counts):
+            self.counts[score] += count
+        self.total += other.total
+
+    def mean(self) -> float | None:
+        if not self.total:
+            return None
+        return sum(score * count for score, count in enumerate(self.counts)) / self.total
+
+    def quantile(self, q: float) -> int | None:
+        """Smallest score with at least a q share of the posts at or below it."""
+        if not self.total:
+            return None
+        threshold = q * self.total
+        running = 0.0
+        last = None
+        for score, count in enumerate(self.counts):
+            if not count:
+                continue
+            running += count
+            last = score
+            if running >= threshold:
+                return score
+        return last
+
+    def summary(self) -> dict[str, Any]:
+        """avg_sentiment plus the QUANTILES as a flat dict."""
+        mean = self.mean()
+        result: dict[str, Any] = {"avg_sentiment": round(mean, 2) if mean is not None else None}
+        for name, q in QUANTILES.items():
+            result[name] = self.quantile(q)
+        return result
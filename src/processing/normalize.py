@@ -0,0 +1,49 @@
+# src/processing/normalize.py
+import os
+import re
+from functools import partial
+
+# default rules; override with SENTIMENT_MAX_TOKENS / SENTIMENT_MAX_HASHTAGS,
+# or set SENTIMENT_NORMALIZE=0 to score the raw text
+MAX_TOKENS = 200
+MAX_HASHTAGS = 3
+
+# trailing punctuation is left behind so it still ends the sentence
+URL_RE = re.compile(r'(?:https?://|www\.)\S*[^\s.,!?)]', re.IGNORECASE)
+MENTION_RE = re.compile(r'(?<![\w@])@\w+(?:\.\w+)*')
+HASHTAG_RUN_RE = re.compile(r'#\w+(?:\s+#\w+)+')
+HASHTAG_RE = re.compile(r'#(\w+)')
+
+
+def normalize_text(text, max_tokens=MAX_TOKENS, max_hashtags=MAX_HASHTAGS):
+    """
+    Cut text down to what carries sentiment before TextBlob sees it:
+    drop URLs and @mentions, keep only the first max_hashtags tags of a
+    run of hashtags, turn hashtags into plain words (so "#trump" still
+    matches a target keyword) and keep at most max_tokens
+    whitespace-separated tokens.
+    """
+    if not text:
+        return text
+    text = URL_RE.sub(' ', text)
+    text = MENTION_RE.sub(' ', text)
+    text = HASHTAG_RUN_RE.sub(lambda m: ' '.join(m.group(0).split()[:max_hashtags]), text)
+    text = HASHTAG_RE.sub(r'\1', text)
+    tokens = text.split()
+    if max_tokens is not None:
+        tokens = tokens[:max_tokens]
+    return ' '.join(tokens)
+
+
+def load_normalizer():
+    """
+    normalize_text with the rules from the environment, or None when
+    SENTIMENT_NORMALIZE is 0/false/off.
+    """
+    if os.getenv('SENTIMENT_NORMALIZE', '1').strip().lower() in ('0', 'false', 'off', 'no'):
+        return None
+    return partial(
+        normalize_text,
+        max_tokens=int(os.getenv('SENTIMENT_MAX_TOKENS', MAX_TOKENS)),
+        max_hashtags=int(os.getenv('SENTIMENT_MAX_HASHTAGS', MAX_HASHTAGS)),
+    )
@@ -0,0 +1,35 @@
+# src/processing/pipeline.py
+from src.processing.targets import PLATFORMS
+
+class ScoringPipeline:
+    """
+    Score freshly scraped posts as they are inserted, so they are stored
+    already scored.
+
+    Both scrape paths only start inserting once the dataset has been
+    fetched (and, streaming, sampled), so there is no network wait left
+    to overlap with; TextBlob scoring is CPU-bound, so it runs inline.
+    Scores are written through the cursor that inserted the post, into
+    the same database (main or shard) and the same transaction.
+    """
+
+    def __init__(self, analyzer):
+        self.analyzer = analyzer
+        self.scored = 0
+
+    def score(self, cur, table, post_id, text):
+        """
+        Score a just-inserted post and write its scores with cur.
+        A post whose scoring fails is left unscored for the next scoring
+        pass. Returns whether it was scored.
+        """
+        if table not in PLATFORMS:
+            raise ValueError(f"Unknown table: {table}")
+        try:
+            overall, target_scores = self.analyzer.score_text(text)
+        except Exception as e:
+            print(f"Error analyzing {table} post {post_id}: {e}")
+            return False
+        self.analyzer.save_scores(cur, table, [(post_id, overall, target_scores)])
+        self.scored += 1
+        return True
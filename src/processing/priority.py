@@ -0,0 +1,176 @@
+# src/processing/priority.py
+"""
+Priority scheduling for the scoring backlog.
+
+Unscored posts from both tables, in the main database and every shard,
+are ranked by engagement (Reddit upvotes, Instagram likes) and recency
+and scored highest first under a row and/or time budget, so the posts
+most likely to move the exports are scored before the stale tail.
+"""
+from __future__ import annotations
+import math
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any
+
+from src.processing.targets import PLATFORMS
+from src.shards import SHARD_DIR, list_shards
+
+# posts table -> engagement column used for ranking
+ENGAGEMENT_COLUMNS: dict[str, str] = {
+    "reddit_posts": "upvotes",
+    "instagram_posts": "likes_count",
+}
+
+# posts table -> column holding the text to score
+TEXT_COLUMNS: dict[str, str] = {
+    "reddit_posts": "text_content",
+    "instagram_posts": "caption",
+}
+
+# a post's priority halves every HALF_LIFE_DAYS of age
+HALF_LIFE_DAYS: float = 7.0
+
+# a post counts as high priority in the backlog status when it ranks at
+# least as high as a post HIGH_PRIORITY_AGE_DAYS old with
+# HIGH_PRIORITY_ENGAGEMENT upvotes/likes (fresher posts need less engagement)
+HIGH_PRIORITY_AGE_DAYS: float = 7.0
+HIGH_PRIORITY_ENGAGEMENT: int = 10
+
+# posts fetched, scored and committed together
+BATCH_SIZE: int = 100
+
+
+def priority(engagement: int | None, age_days: float | None,
+             half_life: float = HALF_LIFE_DAYS) -> float:
+    """
+    (1 + ln(1 + engagement)) halved every half_life days of age.
+    Posts with an unparseable date rank last.
+    """
+    if age_days is None:
+        return 0.0
+    weight = 1.0 + math.log1p(max(engagement or 0, 0))
+    return weight * 0.5 ** (max(age_days, 0.0) / half_life)
+
+
+class PriorityScheduler:
+    """
+    Scores the backlog of a SentimentAnalyzer in priority order across
+    the main database and every shard file.
+    """
+
+    def __init__(self, analyzer: Any, shard_dir: Path = SHARD_DIR,
+                 half_life: float = HALF_LIFE_DAYS,
+                 high_priority_age_days: float = HIGH_PRIORITY_AGE_DAYS,
+                 high_priority_engagement: int = HIGH_PRIORITY_ENGAGEMENT) -> None:
+        self.analyzer = analyzer
+        self.half_life = half_life
+        # lowest priority that counts as high priority in status()
+        self.high_priority = priority(high_priority_engagement, high_priority_age_days, half_life)
+        # after run(): the posts it left unscored
+        self.remaining: list[tuple[float, int, str, int]] | None = None
+        self.connections: list[sqlite3.Connection] = [analyzer.conn]
+        self.connections += [sqlite3.connect(path) for _, path in list_shards(shard_dir=shard_dir)]
+        for conn in self.connections:
+            conn.create_function("priority", 2, self._priority, deterministic=True)
+
+    def _priority(self, engagement: int | None, age_days: float | None) -> float:
+        return priority(engagement, age_days, self.half_life)
+
+    def backlog(self) -> list[tuple[float, int, str, int]]:
+        """(-priority, connection index, table, post id) of every unscored post, best first."""
+        ranked = []
+        for index, conn in enumerate(self.connections):
+            for table, column in ENGAGEMENT_COLUMNS.items():
+                condition, params = self.analyzer.pending_condition(table)
+                rows = conn.execute(f"""
+                    SELECT id, priority({column}, julianday('now') - julianday(post_date))
+                    FROM {table} p
+                    WHERE {condition}
+                """, params)
+                ranked.extend((-score, index, table, post_id) for post_id, score in rows)
+        ranked.sort()
+        return ranked
+
+    def status(self) -> dict[str, dict[str, Any]]:
+        """
+        Per platform: unscored posts, how many are high priority (at or
+        above self.high_priority) and the top priority. After run() this
+        describes the posts it left, without scanning the databases again.
+        """
+        backlog = self.backlog() if self.remaining is None else self.remaining
+        report = {
+            platform: {"pending": 0, "high_priority": 0, "top_priority": 0.0}
+            for platform in PLATFORMS.values()
+        }
+        for neg_score, _, table, _ in backlog:
+            entry = report[PLATFORMS[table]]
+            entry["pending"] += 1
+            if -neg_score >= self.high_priority:
+                entry["high_priority"] += 1
+            entry["top_priority"] = max(entry["top_priority"], float(f"{-neg_score:.3g}"))
+        return report
+
+    def run(self, max_rows: int | None = None, max_seconds: float | None = None,
+            batch_size: int = BATCH_SIZE, stop: threading.Event | None = None) -> int:
+        """
+        Score the backlog best first until it is empty, max_rows posts have
+        been scored, max_seconds have passed or stop is set. Each batch is
+        committed as it completes, including a batch cut short.
+        Returns the number of posts scored.
+        """
+        deadline = None if max_seconds is None else time.monotonic() + max_seconds
+        backlog = self.backlog()
+        queue = backlog if max_rows is None else backlog[:max_rows]
+
+        scored = set()
+        for offset in range(0, len(queue), batch_size):
+            batch = queue[offset:offset + batch_size]
+            scored |= self._score_batch(batch, deadline, stop)
+            if deadline is not None and time.monotonic() >= deadline:
+                break
+            if stop is not None and stop.is_set():
+                break
+        self.remaining = [entry for entry in backlog if entry[1:] not in scored]
+        return len(scored)
+
+    def _score_batch(self, batch: list[tuple[float, int, str, int]], deadline: float | None,
+                     stop: threading.Event | None) -> set[tuple[int, str, int]]:
+        # fetch the batch's texts and stored scores with one query per (connection, table)
+        pending = {}
+        wanted: dict[tuple[int, str], list[int]] = {}
+        for _, index, table, post_id in batch:
+            wanted.setdefault((index, table), []).append(post_id)
+        for (index, table), ids in wanted.items():
+            columns, params = self.analyzer.pending_columns(table, TEXT_COLUMNS[table])
+            placeholders = ', '.join('?' * len(ids))
+            rows = self.connections[index].execute(
+                f"SELECT {columns} FROM {table} p WHERE p.id IN ({placeholders})", (*params, *ids))
+            pending.update(((index, table, row[0]), row[1:]) for row in rows)
+
+        results: dict[tuple[int, str], list[tuple[int, int, dict[str, int | None]]]] = {}
+        for _, index, table, post_id in batch:
+            if deadline is not None and time.monotonic() >= deadline:
+                break
+            if stop is not None and stop.is_set():
+                break
+            try:
+                overall, target_scores = self.analyzer.score_pending(*pending[(index, table, post_id)])
+            except Exception as e:
+                print(f"Error analyzing {PLATFORMS[table]} post {post_id}: {e}")
+                continue
+            results.setdefault((index, table), []).append((post_id, overall, target_scores))
+
+        for (index, table), rows in results.items():
+            self.analyzer.save_scores(self.connections[index].cursor(), table, rows)
+        for index in {index for index, _ in results}:
+            self.connections[index].commit()
+        return {(index, table, post_id) for (index, table), rows in results.items() for post_id, _, _ in rows}
+
+    def close(self) -> None:
+        """Close the shard connections (the analyzer keeps its own)."""
+        for conn in self.connections[1:]:
+            conn.close()
+        del self.connections[1:]
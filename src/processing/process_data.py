@@ -3,9 +3,17 @@ import os
 import csv
 import json
 import sqlite3
+import sys
+from collections import deque
+from datetime import date, timedelta
 from pathlib import Path
 from typing import Sequence, Any
 
+from src.processing.histogram import Histogram, QUANTILES
+from src.processing.sampling import StratifiedEstimator, estimate_fields, load_populations
+from src.processing.targets import PLATFORMS, load_targets
+from src.shards import iter_schemas
+
 # Config
 
 ROOT_DIR: Path = Path(__file__).resolve().parents[2]
@@ -14,6 +22,23 @@ OUT_DIR:   Path = ROOT_DIR / "data"
 
 OUT_DIR.mkdir(exist_ok=True)
 
+# time bucket -> SQL expression grouping post_date into it
+BUCKETS: dict[str, str] = {
+    "day": "date(post_date)",
+    "week": "strftime('%Y-W%W', post_date)",
+    "month": "strftime('%Y-%m', post_date)",
+    "year": "strftime('%Y', post_date)",
+}
+
+# trailing windows (in days) for the daily rolling averages
+ROLLING_WINDOWS: tuple[int, ...] = (7, 30)
+
+# display label per posts table
+PLATFORM_LABELS: dict[str, str] = {
+    "reddit_posts": "Reddit",
+    "instagram_posts": "Instagram",
+}
+
 
 # utilities
 
@@ -32,88 +57,332 @@ def write_json(path: Path, obj: Any) -> None:
         json.dump(obj, fp, indent=2, ensure_ascii=False)
 
 
+def output_path(stem: str, suffix: str, target: str | None = None) -> Path:
+    """Output file for a calculation; per-target files get the target appended."""
+    name = stem if target is None else f"{stem}_{target}"
+    return OUT_DIR / f"{name}{suffix}"
+
+
+def date_range(column: str, start: str | None = None,
+               end: str | None = None) -> tuple[list[str], list[Any]]:
+    """Conditions (and parameters) keeping column within [start, end]."""
+    conditions: list[str] = []
+    params: list[Any] = []
+    if start is not None:
+        conditions.append(f"{column} >= ?")
+        params.append(start)
+    if end is not None:
+        conditions.append(f"{column} <= ?")
+        params.append(end)
+    return conditions, params
+
+
+def sentiment_source(target: str | None = None, sampled: bool = False, schema: str = "main",
+                     start: str | None = None, end: str | None = None,
+                     platforms: Sequence[str] | None = None) -> tuple[str, tuple[Any, ...]]:
+    """
+    SQL (and its parameters) yielding platform, post_date, sentiment, n for
+    every scored post on both platforms in one database schema, n being the
+    number of posts a row stands for: 1 for stored posts, the post count for
+    sentiment_rollup rows kept for posts moved to the archive.
+
+    target=None reads the overall trump_sentiment column; otherwise the
+    scores for that target are read from post_sentiment. sampled=True
+    restricts the rows to the stratified sample and adds its
+    stratum_platform and stratum_month columns; rollup rows are exact, so
+    they form their own strata that are read in full. start/end ('YYYY-MM-DD',
+    inclusive) limit the post dates; platforms ('reddit', 'instagram')
+    limits the tables read.
+
+    With sampled=True every sampled row is returned, with an in_domain
+    column (1 if it is scored and inside [start, end], else 0) instead of
+    those filters: a stratum's sample size must count all its sampled
+    posts, or a month only partly inside [start, end] (or only partly
+    mentioning the target) would be weighted as if all of it were.
+    """
+    parts: list[str] = []
+    params: list[Any] = []
+    for table, label in PLATFORM_LABELS.items():
+        platform = PLATFORMS[table]
+        if platforms is not None and platform not in platforms:
+            continue
+        columns = f"'{label}'         AS platform,\n                   p.post_date"
+        source = f"{schema}.{table} p"
+        column_params: list[Any] = []
+        join_params: list[Any] = []
+        where_params: list[Any] = []
+        if sampled:
+            source = f"{schema}.sentiment_sample ss\n            JOIN   {schema}.{table} p ON p.id = ss.post_id"
+        if target is None:
+            sentiment = "p.trump_sentiment"
+        else:
+            sentiment = "s.score"
+            join = "LEFT JOIN" if sampled else "JOIN  "
+            source += f"\n            {join} {schema}.post_sentiment s\n                   ON s.platform = ? AND s.post_id = p.id AND s.target = ?"
+            join_params += [platform, target]
+        date_conditions, date_params = date_range("date(p.post_date)", start, end)
+        domain = [f"{sentiment} IS NOT NULL", *date_conditions]
+        if sampled:
+            columns += ",\n                   ss.platform       AS stratum_platform,\n                   ss.month          AS stratum_month"
+            columns += f",\n                   CASE WHEN {' AND '.join(domain)} THEN 1 ELSE 0 END AS in_domain"
+            column_params += date_params
+            conditions = ["ss.platform = ?"]
+            where_params.append(platform)
+        else:
+            conditions = domain
+            where_params += date_params
+        columns += f",\n                   {sentiment} AS sentiment"
+        parts.append(f"""
+            SELECT {columns},
+                   1                 AS n
+            FROM   {source}
+            WHERE  {" AND ".join(conditions)}""")
+        params += column_params + join_params + where_params
+
+        # archived posts, pre-aggregated per day and score
+        columns = f"'{label}'         AS platform,\n                   r.day             AS post_date"
+        if sampled:
+            # read in full (weight 1), so filtering them by date is unbiased
+            columns += ",\n                   r.platform || ':archive' AS stratum_platform,\n                   substr(r.day, 1, 7) AS stratum_month"
+            columns += ",\n                   1                 AS in_domain"
+        date_conditions, date_params = date_range("r.day", start, end)
+        conditions = ["r.platform = ?", "r.target = ?", *date_conditions]
+        params += [platform, "" if target is None else target, *date_params]
+        parts.append(f"""
+            SELECT {columns},
+                   r.score           AS sentiment,
+                   r.posts           AS n
+            FROM   {schema}.sentiment_rollup r
+            WHERE  {" AND ".join(conditions)}""")
+    if not parts:
+        raise ValueError(f"No known platform in {platforms!r}")
+    return "\n\n            UNION ALL\n".join(parts), tuple(params)
+
+
 # calculations 
 
-def calc_weekday_sentiment(cur: sqlite3.Cursor) -> None:
+def load_groups(cur: sqlite3.Cursor, keys: dict[str, str], target: str | None = None,
+                approximate: bool = False, start: str | None = None, end: str | None = None,
+                platforms: Sequence[str] | None = None) -> dict[tuple[Any, ...], tuple[Histogram, float | None]]:
     """
-    Get average Trump sentiment by weekday and platform.
+    One pass over the scored posts: count posts per group and score, and
+    fold the counts into a 101-bin histogram per group.
 
-    result: platform, weekday (0=Sun ... 6=Sat), avg_sentiment
+    The main database and every monthly shard overlapping [start, end]
+    are read in turn (shards ATTACHed one at a time) and their counts
+    merged, since histograms simply add up.
+
+    keys maps output name -> SQL expression over platform/post_date.
+    Returns group -> (histogram, margin) where margin is None for exact
+    results. With approximate=True only the stratified sample is read and
+    the histograms are weighted estimates with a 95% margin of error.
     """
-    query = """
-        SELECT platform,
-               weekday,
-               ROUND(AVG(sentiment), 2) AS avg_sentiment
-        FROM (
-            SELECT 'Reddit'      AS platform,
-                   strftime('%w', post_date) AS weekday,
-                   trump_sentiment            AS sentiment
-            FROM   reddit_posts
-            WHERE  trump_sentiment IS NOT NULL
-
-            UNION ALL
-
-            SELECT 'Instagram',
-                   strftime('%w', post_date),
-                   trump_sentiment
-            FROM   instagram_posts
-            WHERE  trump_sentiment IS NOT NULL
-        )
-        GROUP BY platform, weekday
-        ORDER BY platform, weekday;
+    key_exprs = ", ".join(f"{expr} AS {name}" for name, expr in keys.items())
+    key_names = ", ".join(keys)
+    strata = "stratum_platform, stratum_month, in_domain, " if approximate else ""
+
+    histograms: dict[tuple[Any, ...], Histogram] = {}
+    estimator = StratifiedEstimator({})
+    for schema in iter_schemas(cur.connection, start, end):
+        source, params = sentiment_source(target, approximate, schema, start, end, platforms)
+        query = f"""
+            SELECT {strata}{key_exprs},
+                   sentiment,
+                   SUM(n) AS n
+            FROM ({source}
+            )
+            GROUP BY {strata}{key_names}, sentiment;
+        """
+        cur.execute(query, params)
+        rows = cur.fetchall()
+
+        if approximate:
+            # each schema keeps its own sample, so its strata stay separate
+            for (platform, month), population in load_populations(cur, schema).items():
+                estimator.populations[(schema, platform, month)] = population
+            for stratum_platform, stratum_month, in_domain, *key, score, count in rows:
+                # rows outside the domain still count towards their stratum's sample size
+                group = tuple(key) if in_domain else None
+                estimator.add((schema, stratum_platform, stratum_month), group, score, count)
+        else:
+            for *key, score, count in rows:
+                histograms.setdefault(tuple(key), Histogram()).add(score, count)
+
+    if approximate:
+        groups = estimator.estimates()
+    else:
+        groups = {key: (hist, None) for key, hist in histograms.items()}
+    # NULL keys (unparsable dates) sort last instead of failing the comparison
+    return dict(sorted(groups.items(), key=lambda item: tuple(map(str, item[0]))))
+
+
+def summarize(hist: Histogram, margin: float | None) -> dict[str, Any]:
+    """avg_sentiment, quantiles and the exact/approximate fields for one group."""
+    return {**hist.summary(), **estimate_fields(hist, margin)}
+
+
+def distributions(keys: Sequence[str],
+                  groups: dict[tuple[Any, ...], tuple[Histogram, float | None]]) -> list[dict[str, Any]]:
+    """Full per-group distributions for the *_distribution.json exports."""
+    return [
+        {
+            **dict(zip(keys, key)),
+            "estimate": estimate_fields(hist, margin)["estimate"],
+            "count": round(hist.total, 2),
+            "histogram": [round(count, 2) for count in hist.counts],
+        }
+        for key, (hist, margin) in groups.items()
+    ]
+
+
+def calc_weekday_sentiment(cur: sqlite3.Cursor, target: str | None = None,
+                           approximate: bool = False, start: str | None = None,
+                           end: str | None = None) -> None:
+    """
+    Get sentiment by weekday and platform, overall or for one target.
+
+    result: platform, weekday (0=Sun ... 6=Sat), avg_sentiment, p10, p50, p90,
+    estimate (exact/approximate), ci_low, ci_high
+    plus the full per-group histograms as JSON
     """
-    cur.execute(query)
-    rows = cur.fetchall()
+    keys = {"platform": "platform", "weekday": "strftime('%w', post_date)"}
+    groups = load_groups(cur, keys, target, approximate, start, end)
+    rows = []
+    for (platform, weekday), (hist, margin) in groups.items():
+        rows.append((platform, weekday, *summarize(hist, margin).values()))
     write_csv(
-        OUT_DIR / "weekday_sentiment.csv",
-        header=("platform", "weekday", "avg_sentiment"),
+        output_path("weekday_sentiment", ".csv", target),
+        header=("platform", "weekday", "avg_sentiment", *QUANTILES, "estimate", "ci_low", "ci_high"),
         rows=rows,
     )
+    write_json(output_path("weekday_sentiment_distribution", ".json", target),
+               distributions(list(keys), groups))
+
+def calc_monthly_sentiment(cur: sqlite3.Cursor, target: str | None = None,
+                           approximate: bool = False, start: str | None = None,
+                           end: str | None = None) -> None:
+    """
+    Monthly sentiment trend with both platforms, overall or for one target.
+    Result: a JSON list of {"month": "...", "avg_sentiment": ..., "p10": ...,
+    "estimate": "exact" | "approximate", "ci_low": ..., "ci_high": ...}
+    plus the full per-month histograms as JSON
+    """
+    keys = {"month": BUCKETS["month"]}
+    groups = load_groups(cur, keys, target, approximate, start, end)
+    data = [{"month": month, **summarize(hist, margin)} for (month,), (hist, margin) in groups.items()]
+    write_json(output_path("monthly_sentiment", ".json", target), data)
+    write_json(output_path("monthly_sentiment_distribution", ".json", target),
+               distributions(list(keys), groups))
 
-def calc_monthly_sentiment(cur: sqlite3.Cursor) -> None:
+def daily_series(cur: sqlite3.Cursor, target: str | None = None, approximate: bool = False,
+                 start: str | None = None, end: str | None = None,
+                 windows: Sequence[int] = ROLLING_WINDOWS) -> list[dict[str, Any]]:
     """
-    Overall monthly sentiment trend with both platforms.
-    Result: a JSON list of {"month": "...", "avg_sentiment": ...}
+    Daily average sentiment plus trailing rolling averages over the given
+    calendar-day windows.
+
+    SQLite returns one (sum, count) per day; the rolling values come from
+    a single ordered pass that adds each day to running sums and subtracts
+    days as they fall out of each window, so the cost is linear in days.
+
+    With approximate=True the days are estimated from the stratified
+    sample like the other aggregates: posts is then an estimated count,
+    each day carries its 95% confidence interval, and the rolling averages
+    are ratios of the estimated sums (without an interval of their own).
     """
-    query = """
-        SELECT month,
-               ROUND(AVG(sentiment), 2) AS avg_sentiment
-        FROM (
-            SELECT strftime('%Y-%m', post_date) AS month,
-                   trump_sentiment AS sentiment
-            FROM   reddit_posts
-            WHERE  trump_sentiment IS NOT NULL
-
-            UNION ALL
-
-            SELECT strftime('%Y-%m', post_date),
-                   trump_sentiment
-            FROM   instagram_posts
-            WHERE  trump_sentiment IS NOT NULL
-        )
-        GROUP BY month
-        ORDER BY month;
+    totals: dict[str, list[float]] = {}
+    fields: dict[str, dict[str, Any]] = {}
+    if approximate:
+        groups = load_groups(cur, {"day": "date(post_date)"}, target, True, start, end)
+        for (day,), (hist, margin) in groups.items():
+            if day is not None:
+                totals[day] = [hist.mean() * hist.total, hist.total]
+                fields[day] = estimate_fields(hist, margin)
+    else:
+        for schema in iter_schemas(cur.connection, start, end):
+            source, params = sentiment_source(target, schema=schema, start=start, end=end)
+            cur.execute(f"""
+                SELECT date(post_date) AS day,
+                       SUM(sentiment * n),
+                       SUM(n)
+                FROM ({source}
+                )
+                WHERE day IS NOT NULL
+                GROUP BY day;
+            """, params)
+            for day, total, count in cur.fetchall():
+                cell = totals.setdefault(day, [0, 0])
+                cell[0] += total
+                cell[1] += count
+    exact = estimate_fields(Histogram())
+
+    windows = list(windows)
+    queues: list[deque[tuple[date, float, float]]] = [deque() for _ in windows]
+    running = [[0, 0] for _ in windows]
+    series = []
+    for day in sorted(totals):
+        total, count = totals[day]
+        current = date.fromisoformat(day)
+        point: dict[str, Any] = {
+            "day": day,
+            "avg_sentiment": round(total / count, 2),
+            "posts": round(count, 2) if approximate else count,
+            **fields.get(day, exact),
+        }
+        for window, queue, sums in zip(windows, queues, running):
+            queue.append((current, total, count))
+            sums[0] += total
+            sums[1] += count
+            oldest = current - timedelta(days=window)
+            while queue[0][0] <= oldest:
+                _, old_total, old_count = queue.popleft()
+                sums[0] -= old_total
+                sums[1] -= old_count
+            point[f"rolling_{window}"] = round(sums[0] / sums[1], 2)
+        series.append(point)
+    return series
+
+
+def calc_daily_sentiment(cur: sqlite3.Cursor, target: str | None = None,
+                         approximate: bool = False, start: str | None = None,
+                         end: str | None = None) -> None:
     """
-    cur.execute(query)
-    rows = cur.fetchall()
-    data = [{"month": m, "avg_sentiment": s} for m, s in rows]
-    write_json(OUT_DIR / "monthly_sentiment.json", data)
+    Daily sentiment trend with both platforms, overall or for one target.
+    Result: a JSON list of {"day": "YYYY-MM-DD", "avg_sentiment": ..., "posts": ...,
+    "estimate": "exact" | "approximate", "ci_low": ..., "ci_high": ...,
+    "rolling_7": ..., "rolling_30": ...}
+    """
+    write_json(output_path("daily_sentiment", ".json", target),
+               daily_series(cur, target, approximate, start, end))
 
 # main
 
-def main() -> None:
+def main(targets: Sequence[str] | None = None, approximate: bool = False,
+         start: str | None = None, end: str | None = None,
+         conn: sqlite3.Connection | None = None) -> None:
+    """Write every calculation file; conn reuses an open connection to DB_PATH."""
     if not DB_PATH.exists():
         raise SystemExit(f"Database not found at {DB_PATH}")
+    if targets is None:
+        targets = list(load_targets())
 
-    with sqlite3.connect(DB_PATH) as conn:
+    with (conn or sqlite3.connect(DB_PATH)) as conn:
         cur = conn.cursor()
 
-        print("Making Part‑3 calculation files...")
-        calc_weekday_sentiment(cur)
-        calc_monthly_sentiment(cur)
+        mode = " (approximate, from the stratified sample)" if approximate else ""
+        print(f"Making Part‑3 calculation files{mode}...")
+        calc_weekday_sentiment(cur, approximate=approximate, start=start, end=end)
+        calc_monthly_sentiment(cur, approximate=approximate, start=start, end=end)
+        calc_daily_sentiment(cur, approximate=approximate, start=start, end=end)
+
+        for target in targets:
+            print(f"Making calculation files for target '{target}'...")
+            calc_weekday_sentiment(cur, target, approximate, start, end)
+            calc_monthly_sentiment(cur, target, approximate, start, end)
+            calc_daily_sentiment(cur, target, approximate, start, end)
 
     print("All files written to", OUT_DIR.resolve())
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main(approximate="--approximate" in sys.argv[1:])
\ No newline at end of file
@@ -0,0 +1,161 @@
+from __future__ import annotations
+import math
+import random
+import sqlite3
+from typing import Any, Hashable
+
+from src.processing.histogram import Histogram
+from src.processing.targets import PLATFORMS
+
+# sampled posts kept per (platform, month) stratum
+SAMPLE_SIZE: int = 200
+
+# two-sided 95% normal quantile
+Z_95: float = 1.96
+
+
+def record_sample(cur: sqlite3.Cursor, table: str, post_id: int,
+                  capacity: int = SAMPLE_SIZE, rng: random.Random | Any = random) -> None:
+    """
+    Reservoir-sample a freshly inserted post into its (platform, month)
+    stratum. Call right after the INSERT, with the same cursor.
+    """
+    platform = PLATFORMS[table]
+    cur.execute(f"SELECT strftime('%Y-%m', post_date) FROM {table} WHERE id = ?", (post_id,))
+    row = cur.fetchone()
+    if row is None or row[0] is None:
+        return
+    month = row[0]
+
+    cur.execute("""
+        INSERT INTO sample_strata (platform, month, population)
+        VALUES (?, ?, 1)
+        ON CONFLICT (platform, month) DO UPDATE SET population = population + 1
+    """, (platform, month))
+    cur.execute("SELECT population FROM sample_strata WHERE platform = ? AND month = ?",
+                (platform, month))
+    population = cur.fetchone()[0]
+
+    if population > capacity:
+        j = rng.randrange(population)
+        if j >= capacity:
+            return
+        cur.execute("""
+            DELETE FROM sentiment_sample
+            WHERE platform = ? AND month = ? AND post_id = (
+                SELECT post_id FROM sentiment_sample
+                WHERE platform = ? AND month = ?
+                ORDER BY post_id LIMIT 1 OFFSET ?
+            )
+        """, (platform, month, platform, month, j))
+    cur.execute("INSERT INTO sentiment_sample (platform, month, post_id) VALUES (?, ?, ?)",
+                (platform, month, post_id))
+
+
+def rebuild_sample(cur: sqlite3.Cursor, capacity: int = SAMPLE_SIZE) -> None:
+    """Rebuild the strata and sample from scratch over every stored post."""
+    cur.execute("DELETE FROM sample_strata")
+    cur.execute("DELETE FROM sentiment_sample")
+    for table, platform in PLATFORMS.items():
+        cur.execute(f"""
+            INSERT INTO sample_strata (platform, month, population)
+            SELECT ?, strftime('%Y-%m', post_date) AS month, COUNT(*)
+            FROM {table}
+            WHERE month IS NOT NULL
+            GROUP BY month
+        """, (platform,))
+        cur.execute(f"""
+            INSERT INTO sentiment_sample (platform, month, post_id)
+            SELECT ?, month, id
+            FROM (
+                SELECT strftime('%Y-%m', post_date) AS month,
+                       id,
+                       ROW_NUMBER() OVER (PARTITION BY strftime('%Y-%m', post_date)
+                                          ORDER BY random()) AS rn
+                FROM {table}
+            )
+            WHERE month IS NOT NULL AND rn <= ?
+        """, (platform, capacity))
+
+
+def load_populations(cur: sqlite3.Cursor, schema: str = "main") -> dict[tuple[str, str], int]:
+    """(platform, month) -> number of posts ingested into that stratum."""
+    cur.execute(f"SELECT platform, month, population FROM {schema}.sample_strata")
+    return {(platform, month): population for platform, month, population in cur.fetchall()}
+
+
+class StratifiedEstimator:
+    """
+    Group means and distributions from a stratified sample.
+
+    Each group (domain) mean is a ratio estimator weighted by
+    population / sample size per stratum; its variance uses the usual
+    linearization with a finite population correction. Units are fed
+    as (stratum, group, score, count) from grouped queries.
+    """
+
+    def __init__(self, populations: dict[Hashable, int]) -> None:
+        self.populations = populations
+        self.stratum_sizes: dict[Hashable, float] = {}
+        self.cells: dict[tuple[Hashable, Hashable], Histogram] = {}
+
+    def add(self, stratum: Hashable, group: Hashable, score: int | None, count: int = 1) -> None:
+        """
+        Feed count sampled units of stratum. group=None marks units outside
+        every group (outside the date range, unscored, ...): they only count
+        towards the stratum's sample size, which every estimate needs.
+        """
+        self.stratum_sizes[stratum] = self.stratum_sizes.get(stratum, 0) + count
+        if group is not None:
+            self.cells.setdefault((stratum, group), Histogram()).add(score, count)
+
+    def population(self, stratum: Hashable) -> float:
+        n = self.stratum_sizes[stratum]
+        return max(self.populations.get(stratum, n), n)
+
+    def estimates(self) -> dict[Hashable, tuple[Histogram, float]]:
+        """group -> (weighted histogram, 95% margin of error of its mean)"""
+        by_group: dict[Hashable, list[tuple[Hashable, Histogram]]] = {}
+        for (stratum, group), cell in self.cells.items():
+            by_group.setdefault(group, []).append((stratum, cell))
+
+        results: dict[Hashable, tuple[Histogram, float]] = {}
+        for group, cells in by_group.items():
+            weighted = Histogram()
+            for stratum, cell in cells:
+                weight = self.population(stratum) / self.stratum_sizes[stratum]
+                weighted.merge(Histogram(count * weight for count in cell.counts))
+            ratio = weighted.mean()
+
+            variance = 0.0
+            for stratum, cell in cells:
+                n_h = self.stratum_sizes[stratum]
+                if n_h < 2:
+                    continue
+                pop = self.population(stratum)
+                n_d = cell.total
+                s_d = sum(score * count for score, count in enumerate(cell.counts))
+                q_d = sum(score * score * count for score, count in enumerate(cell.counts))
+                # residuals z = y - ratio inside the group, 0 elsewhere in the stratum
+                z_sum = s_d - n_d * ratio
+                z_sq = q_d - 2 * ratio * s_d + n_d * ratio * ratio
+                s2 = max(0.0, (z_sq - z_sum * z_sum / n_h) / (n_h - 1))
+                variance += pop * pop * (1 - n_h / pop) * s2 / n_h
+            margin = Z_95 * math.sqrt(variance) / weighted.total
+            results[group] = (weighted, margin)
+        return results
+
+
+def estimate_fields(hist: Histogram, margin: float | None = None) -> dict[str, Any]:
+    """
+    Fields telling export consumers whether a value is exact or an
+    approximation, with its 95% confidence interval when approximate.
+    """
+    mean = hist.mean()
+    if margin is None or mean is None:
+        return {"estimate": "exact", "ci_low": None, "ci_high": None}
+    return {
+        "estimate": "approximate",
+        "ci_low": round(max(0.0, mean - margin), 2),
+        "ci_high": round(min(100.0, mean + margin), 2),
+    }
@@ -1,95 +1,274 @@
 # src/processing/sentiment_analyzer.py
+import json
 import sqlite3
+import sys
+import time
+from functools import lru_cache
 from textblob import TextBlob
 import os
 from dotenv import load_dotenv
 
+from src.processing.normalize import load_normalizer
+from src.processing.priority import PriorityScheduler
+from src.processing.targets import PLATFORMS, load_targets
+from src.shards import list_shards
+
+# distinct normalized texts whose scores are kept in memory
+SCORE_CACHE_SIZE = 4096
+
 class SentimentAnalyzer:
-    def __init__(self, db_path=None):
+    def __init__(self, db_path=None, targets=None, normalize=True, cache_size=SCORE_CACHE_SIZE):
         if db_path is None:
             db_path = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', 'data', 'project.db'))
         self.db_path = db_path
         self.conn = sqlite3.connect(self.db_path)
         self.cur = self.conn.cursor()
+        self.targets = {
+            name: frozenset(keywords)
+            for name, keywords in (load_targets() if targets is None else targets).items()
+        }
+        # normalize=False scores the raw text; cache_size=0 disables the score cache
+        self.normalizer = load_normalizer() if normalize else None
+        self.score_blob = lru_cache(maxsize=cache_size)(self._score_blob) if cache_size else self._score_blob
+
+    def prepare_text(self, text):
+        """Text as it is scored: normalized unless normalization is off"""
+        if text and self.normalizer:
+            return self.normalizer(text)
+        return text
+
+    @staticmethod
+    def polarity_to_score(polarity):
+        """Map a TextBlob polarity (-1..1) onto the 0-100 scale"""
+        score = int((polarity + 1) * 50)
+        return max(0, min(100, score))
 
     def calculate_sentiment(self, text):
         """
         Calculate sentiment score from 0-100 using TextBlob
         0 = most negative, 100 = most positive
         """
+        text = self.prepare_text(text)
         if not text:
-            return 50  
-        
+            return 50
+
         sentiment = TextBlob(text).sentiment.polarity
-        
-        score = int((sentiment + 1) * 50)
-        
-        return max(0, min(100, score))
 
-    def analyze_reddit_posts(self):
-        """Analyze sentiment of Reddit posts and update the database"""
-        print("\nAnalyzing Reddit posts...")
-        
-        self.cur.execute('''
-            SELECT id, text_content 
-            FROM reddit_posts 
-            WHERE trump_sentiment IS NULL
-        ''')
-        
+        return self.polarity_to_score(sentiment)
+
+    def score_text(self, text, targets=None):
+        """
+        Score the whole text and every configured target from one TextBlob pass.
+
+        A target is scored as the mean polarity of the sentences that mention
+        one of its keywords, or None if no sentence does. Sentences are only
+        scored once, however many targets mention them. The text is
+        normalized first, and scores are cached per normalized text.
+        targets limits scoring to those target names and skips the overall
+        score, which then comes back as None.
+        Returns (overall_score, {target: score})
+        """
+        names = None if targets is None else tuple(name for name in self.targets if name in targets)
+        text = self.prepare_text(text)
+        if not text:
+            return (50 if names is None else None), {name: None for name in (self.targets if names is None else names)}
+        overall, target_scores = self.score_blob(text, names)
+        return overall, dict(target_scores)
+
+    def _score_blob(self, text, names=None):
+        blob = TextBlob(text)
+        overall = self.polarity_to_score(blob.sentiment.polarity) if names is None else None
+
+        sentences = [(frozenset(w.lower() for w in s.words), s) for s in blob.sentences]
+        polarities = {}
+        target_scores = {}
+        for name in self.targets if names is None else names:
+            keywords = self.targets[name]
+            matched = []
+            for i, (words, sentence) in enumerate(sentences):
+                if words & keywords:
+                    if i not in polarities:
+                        polarities[i] = sentence.sentiment.polarity
+                    matched.append(polarities[i])
+            target_scores[name] = (
+                self.polarity_to_score(sum(matched) / len(matched)) if matched else None
+            )
+        return overall, target_scores
+
+    def save_scores(self, cur, table, results):
+        """
+        Write (post_id, overall_score, target_scores) results for table:
+        the overall score into trump_sentiment, target scores into post_sentiment.
+        An overall score of None is skipped, and a stored overall score is
+        never overwritten.
+        """
+        platform = PLATFORMS[table]
+        cur.executemany(f'''
+            UPDATE {table}
+            SET trump_sentiment = ?
+            WHERE id = ? AND trump_sentiment IS NULL
+        ''', [(overall, post_id) for post_id, overall, _ in results if overall is not None])
+        cur.executemany('''
+            INSERT OR REPLACE INTO post_sentiment (platform, post_id, target, score)
+            VALUES (?, ?, ?, ?)
+        ''', [
+            (platform, post_id, name, score)
+            for post_id, _, target_scores in results
+            for name, score in target_scores.items()
+        ])
+
+    def pending_condition(self, table):
+        """
+        WHERE clause (for table aliased as p) and its parameters matching posts
+        that have no overall score yet or are missing a configured target
+        """
+        names = list(self.targets)
+        placeholders = ', '.join('?' * len(names))
+        condition = f'''trump_sentiment IS NULL
+               OR (SELECT COUNT(*) FROM post_sentiment s
+                   WHERE s.platform = ? AND s.post_id = p.id
+                   AND s.target IN ({placeholders})) < ?'''
+        return condition, (PLATFORMS[table], *names, len(names))
+
+    def pending_columns(self, table, text_column):
+        """
+        SELECT list (for table aliased as p) and its parameters giving what
+        score_pending needs: id, text, overall score and the JSON array of
+        targets already stored for the post
+        """
+        columns = f'''p.id, p.{text_column}, p.trump_sentiment,
+                   (SELECT json_group_array(s.target) FROM post_sentiment s
+                    WHERE s.platform = ? AND s.post_id = p.id)'''
+        return columns, (PLATFORMS[table],)
+
+    def score_pending(self, text, overall, stored_targets):
+        """
+        Score only what a post is missing: everything when it has no overall
+        score yet, otherwise just the configured targets not in stored_targets
+        (a JSON array), with None for the already stored overall score
+        """
+        if overall is None:
+            return self.score_text(text)
+        stored = set(json.loads(stored_targets or '[]'))
+        return self.score_text(text, targets=[name for name in self.targets if name not in stored])
+
+    def analyze_table(self, table, text_column, label):
+        """
+        Score posts in table that have no overall score yet or are missing
+        a configured target, and update the database
+        """
+        print(f"\nAnalyzing {label} posts...")
+
+        columns, column_params = self.pending_columns(table, text_column)
+        condition, params = self.pending_condition(table)
+        self.cur.execute(f'''
+            SELECT {columns}
+            FROM {table} p
+            WHERE {condition}
+        ''', (*column_params, *params))
+
         posts = self.cur.fetchall()
-        print(f"Found {len(posts)} Reddit posts to analyze")
-        
-        for post_id, text in posts:
+        print(f"Found {len(posts)} {label} posts to analyze")
+
+        results = []
+        for post_id, text, stored_overall, stored_targets in posts:
             try:
-                sentiment_score = self.calculate_sentiment(text)
-                
-                self.cur.execute('''
-                    UPDATE reddit_posts 
-                    SET trump_sentiment = ? 
-                    WHERE id = ?
-                ''', (sentiment_score, post_id))
-                
+                overall, target_scores = self.score_pending(text, stored_overall, stored_targets)
+                results.append((post_id, overall, target_scores))
             except Exception as e:
-                print(f"Error analyzing Reddit post {post_id}: {e}")
+                print(f"Error analyzing {label} post {post_id}: {e}")
                 continue
-        
+
+        self.save_scores(self.cur, table, results)
         self.conn.commit()
-        print(f"Updated {len(posts)} Reddit posts with sentiment scores")
+        print(f"Updated {len(results)} {label} posts with sentiment scores")
+
+    def analyze_reddit_posts(self):
+        """Analyze sentiment of Reddit posts and update the database"""
+        self.analyze_table('reddit_posts', 'text_content', 'Reddit')
 
     def analyze_instagram_posts(self):
         """Analyze sentiment of Instagram posts and update the database"""
-        print("\nAnalyzing Instagram posts...")
-        
-        self.cur.execute('''
-            SELECT id, caption 
-            FROM instagram_posts 
-            WHERE trump_sentiment IS NULL
-        ''')
-        
-        posts = self.cur.fetchall()
-        print(f"Found {len(posts)} Instagram posts to analyze")
-        
-        for post_id, caption in posts:
-            try:
-                sentiment_score = self.calculate_sentiment(caption)
-                
-                self.cur.execute('''
-                    UPDATE instagram_posts 
-                    SET trump_sentiment = ? 
-                    WHERE id = ?
-                ''', (sentiment_score, post_id))
-                
-            except Exception as e:
-                print(f"Error analyzing Instagram post {post_id}: {e}")
-                continue
-        
-        self.conn.commit()
-        print(f"Updated {len(posts)} Instagram posts with sentiment scores")
+        self.analyze_table('instagram_posts', 'caption', 'Instagram')
 
     def close(self):
         """Close database connection"""
         self.conn.close()
 
+def print_backlog_status(status):
+    """Print PriorityScheduler.status() as one line per platform"""
+    for platform, entry in status.items():
+        print(f"{platform}: {entry['pending']} unscored, "
+              f"{entry['high_priority']} high priority (top priority {entry['top_priority']})")
+
+def main_prioritized(max_rows=None, max_seconds=None):
+    """
+    Score the backlog of both tables, main database and shards, in
+    engagement/recency priority order within the given budget
+    """
+    analyzer = SentimentAnalyzer()
+    scheduler = PriorityScheduler(analyzer)
+    try:
+        print("\nScoring backlog in priority order...")
+        scored = scheduler.run(max_rows=max_rows, max_seconds=max_seconds)
+        print(f"Scored {scored} posts")
+        print("\nRemaining backlog:")
+        print_backlog_status(scheduler.status())
+    finally:
+        scheduler.close()
+        analyzer.close()
+
+def compare_normalization(limit=1000):
+    """
+    Score up to limit stored posts (half per platform) from the raw text and
+    from the normalized text, and report the throughput of each and the
+    score drift between them
+    """
+    raw = SentimentAnalyzer(normalize=False, cache_size=0)
+    normalized = SentimentAnalyzer(cache_size=0)
+    cached = SentimentAnalyzer()
+    try:
+        if normalized.normalizer is None:
+            print("Normalization is disabled (SENTIMENT_NORMALIZE)")
+            return
+        texts = []
+        for table, column in (('reddit_posts', 'text_content'), ('instagram_posts', 'caption')):
+            raw.cur.execute(f'SELECT {column} FROM {table} ORDER BY id DESC LIMIT ?', (limit // 2,))
+            texts += [text for (text,) in raw.cur.fetchall()]
+        if not texts:
+            print("No posts to compare")
+            return
+        raw.score_text("warm up")  # loads the TextBlob corpora outside the timings
+
+        runs = {}
+        for label, analyzer in (('raw', raw), ('normalized', normalized), ('normalized+cache', cached)):
+            started = time.perf_counter()
+            scores = [analyzer.score_text(text) for text in texts]
+            runs[label] = (time.perf_counter() - started, scores)
+
+        raw_chars = sum(len(text or '') for text in texts)
+        normalized_chars = sum(len(normalized.prepare_text(text) or '') for text in texts)
+        print(f"\nCompared {len(texts)} posts; text length {raw_chars} -> {normalized_chars} characters")
+        for label, (elapsed, _) in runs.items():
+            print(f"{label}: {len(texts) / elapsed:.1f} posts/s")
+
+        raw_scores, normalized_scores = runs['raw'][1], runs['normalized'][1]
+        diffs = [abs(a[0] - b[0]) for a, b in zip(raw_scores, normalized_scores)]
+        print(f"Overall score drift: mean |diff| {sum(diffs) / len(diffs):.2f}, "
+              f"{sum(d > 0 for d in diffs) / len(diffs):.1%} changed, "
+              f"{sum(d > 10 for d in diffs) / len(diffs):.1%} by more than 10, max {max(diffs)}")
+        for name in normalized.targets:
+            pairs = [(a[1][name], b[1][name]) for a, b in zip(raw_scores, normalized_scores)]
+            both = [abs(a - b) for a, b in pairs if a is not None and b is not None]
+            flipped = sum((a is None) != (b is None) for a, b in pairs)
+            mean = f"{sum(both) / len(both):.2f}" if both else "n/a"
+            print(f"Target {name}: mean |diff| {mean} over {len(both)} posts, "
+                  f"{flipped} gained or lost a mention")
+    finally:
+        raw.close()
+        normalized.close()
+        cached.close()
+
 def main():
     analyzer = SentimentAnalyzer()
     try:
@@ -98,5 +277,18 @@ def main():
     finally:
         analyzer.close()
 
+    # Posts routed to monthly shard files are scored in place
+    for month, path in list_shards():
+        print(f"\nScoring shard {month}...")
+        analyzer = SentimentAnalyzer(db_path=str(path))
+        try:
+            analyzer.analyze_reddit_posts()
+            analyzer.analyze_instagram_posts()
+        finally:
+            analyzer.close()
+
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    if "--compare-normalization" in sys.argv[1:]:
+        compare_normalization()
+    else:
+        main()
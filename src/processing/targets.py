@@ -0,0 +1,42 @@
+# src/processing/targets.py
+import os
+
+# target name -> keywords (lowercase single words) that mark a sentence as
+# being about that target
+DEFAULT_TARGETS = {
+    "trump": ("trump", "donald"),
+}
+
+# posts table -> platform key used in post_sentiment
+PLATFORMS = {
+    "reddit_posts": "reddit",
+    "instagram_posts": "instagram",
+}
+
+
+def parse_targets(spec):
+    """
+    Parse a target spec like "trump=trump,donald;musk=musk,elon".
+    A target without keywords uses its own name as the only keyword.
+    """
+    targets = {}
+    for entry in spec.split(';'):
+        entry = entry.strip()
+        if not entry:
+            continue
+        name, _, keywords = entry.partition('=')
+        name = name.strip().lower()
+        words = tuple(w.strip().lower() for w in keywords.split(',') if w.strip())
+        targets[name] = words or (name,)
+    return targets
+
+
+def load_targets():
+    """
+    Targets from the SENTIMENT_TARGETS environment variable,
+    falling back to DEFAULT_TARGETS.
+    """
+    spec = os.getenv('SENTIMENT_TARGETS')
+    if spec:
+        return parse_targets(spec)
+    return dict(DEFAULT_TARGETS)
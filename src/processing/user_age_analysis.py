@@ -4,76 +4,192 @@ from pathlib import Path
 import json
 from datetime import datetime
 
-def analyze_account_age_sentiment():
+from src.processing.histogram import Histogram
+from src.processing.process_data import date_range
+from src.processing.sampling import StratifiedEstimator, estimate_fields, load_populations
+from src.shards import iter_schemas
+
+AGE_RANGES = [
+    (0, 3),
+    (3, 6),
+    (6, 12),
+    (12, 24),
+    (24, 36),
+    (36, 60),
+    (60, 84),
+    (84, 120),
+    (120, None)
+]
+
+def account_age_summaries(conn, target=None, approximate=False, start=None, end=None):
+    """
+    Reddit sentiment distribution (average, p10/p50/p90 and histogram) per
+    account age range, overall or for one target from post_sentiment.
+    With approximate=True only the stratified sample is read and each range
+    is reported as an estimate with a 95% confidence interval.
+    start/end ('YYYY-MM-DD', inclusive) limit the post dates and the
+    monthly shards that get attached.
+    Returns (summaries, distributions), one entry per non-empty range.
+    """
+    cur = conn.cursor()
+
+    def age_range_index(age_months):
+        for i, (min_age, max_age) in enumerate(AGE_RANGES):
+            if age_months >= min_age and (max_age is None or age_months < max_age):
+                return i
+        return None
+
+    histograms = {}
+    estimator = StratifiedEstimator({})
+
+    # The main database and each shard in [start, end] in turn;
+    # users always live in the main database
+    for schema in iter_schemas(conn, start, end):
+        date_conditions, date_params = date_range("date(rp.post_date)", start, end)
+        rollup_date_conditions, rollup_date_params = date_range("r.day", start, end)
+        join = "LEFT JOIN" if approximate else "JOIN"
+        if target is None:
+            sentiment_column = "rp.trump_sentiment"
+            sentiment_join = ""
+            join_params = []
+        else:
+            sentiment_column = "s.score"
+            sentiment_join = f"{join} {schema}.post_sentiment s ON s.platform = 'reddit' AND s.post_id = rp.id AND s.target = ?"
+            join_params = [target]
+        domain = [f"{sentiment_column} IS NOT NULL", "ru.account_created IS NOT NULL", *date_conditions]
+
+        if approximate:
+            # Every sampled post is read, so each stratum's sample size is
+            # complete; posts outside the domain are flagged, not filtered
+            stratum_column = f"'reddit' as stratum_platform, ss.month as stratum_month, CASE WHEN {' AND '.join(domain)} THEN 1 ELSE 0 END as in_domain,"
+            column_params = date_params
+            rollup_stratum_column = "'reddit:archive' as stratum_platform, substr(r.day, 1, 7) as stratum_month, 1 as in_domain,"
+            posts_source = f"{schema}.sentiment_sample ss JOIN {schema}.reddit_posts rp ON rp.id = ss.post_id"
+            posts_condition = "ss.platform = 'reddit'"
+            where_params = []
+            stratum_group = "stratum_platform, stratum_month, in_domain, "
+        else:
+            stratum_column = ""
+            column_params = []
+            rollup_stratum_column = ""
+            posts_source = f"{schema}.reddit_posts rp"
+            posts_condition = " AND ".join(domain)
+            where_params = date_params
+            stratum_group = ""
+        rollup_condition = " AND ".join(["r.platform = 'reddit'", "r.target = ?", "r.account_month != ''",
+                                         *rollup_date_conditions])
+
+        # One pass: count posts per account age (in months) and score,
+        # including archived posts from the rollup table
+        query = f"""
+            SELECT {stratum_group}age_months, sentiment, SUM(n) as post_count
+            FROM (
+                SELECT 
+                    {stratum_column}
+                    (strftime('%m', 'now') + 12 * strftime('%Y', 'now')) - (strftime('%m', ru.account_created) + 12 * strftime('%Y', ru.account_created)) as age_months,
+                    {sentiment_column} as sentiment,
+                    1 as n
+                FROM {posts_source}
+                {join} main.reddit_users ru ON ru.user_id = rp.account_id
+                {sentiment_join}
+                WHERE {posts_condition}
+
+                UNION ALL
+
+                SELECT
+                    {rollup_stratum_column}
+                    (strftime('%m', 'now') + 12 * strftime('%Y', 'now')) - (strftime('%m', r.account_month || '-01') + 12 * strftime('%Y', r.account_month || '-01')) as age_months,
+                    r.score as sentiment,
+                    r.posts as n
+                FROM {schema}.sentiment_rollup r
+                WHERE {rollup_condition}
+            )
+            GROUP BY {stratum_group}age_months, sentiment
+        """
+        params = [*column_params, *join_params, *where_params,
+                  '' if target is None else target, *rollup_date_params]
+        cur.execute(query, params)
+        rows = cur.fetchall()
+
+        if approximate:
+            for (platform, month), population in load_populations(cur, schema).items():
+                estimator.populations[(schema, platform, month)] = population
+            for stratum_platform, stratum_month, in_domain, age_months, sentiment, post_count in rows:
+                # posts outside the domain or every range still count towards their stratum's sample size
+                group = age_range_index(age_months) if in_domain else None
+                estimator.add((schema, stratum_platform, stratum_month), group, sentiment, post_count)
+        else:
+            for age_months, sentiment, post_count in rows:
+                i = age_range_index(age_months)
+                histograms.setdefault(i, Histogram()).add(sentiment, post_count)
+
+    if approximate:
+        groups = estimator.estimates()
+    else:
+        groups = {i: (hist, None) for i, hist in histograms.items()}
+
+    results = []
+    distributions = []
+    for i, (min_age, max_age) in enumerate(AGE_RANGES):
+        if max_age is None:
+            range_label = f"{min_age}+ months"
+        else:
+            range_label = f"{min_age}-{max_age} months"
+        
+        hist, margin = groups.get(i, (Histogram(), None))
+        if hist.total > 0: 
+            estimate = estimate_fields(hist, margin)
+            results.append({
+                "account_age_range": range_label,
+                **hist.summary(),
+                **estimate
+            })
+            distributions.append({
+                "account_age_range": range_label,
+                "estimate": estimate["estimate"],
+                "count": round(hist.total, 2),
+                "histogram": [round(count, 2) for count in hist.counts]
+            })
+
+    return results, distributions
+
+def analyze_account_age_sentiment(target=None, approximate=False, start=None, end=None, conn=None):
+    """
+    Write the account age summaries (see account_age_summaries) and their
+    distributions to data/account_age_sentiment*.json.
+    conn reuses an open connection to the database (left open).
+    """
     db_path = Path(__file__).parent.parent.parent / 'data' / 'project.db'
+    own_conn = conn is None
     
     try:
-        conn = sqlite3.connect(db_path)
-        cur = conn.cursor()
-        
-        age_ranges = [
-            (0, 3),     
-            (3, 6),      
-            (6, 12),   
-            (12, 24),    
-            (24, 36),    
-            (36, 60),
-            (60, 84),   
-            (84, 120),   
-            (120, None)  
-        ]
-        
-        results = []
-        
-        for min_age, max_age in age_ranges:
-            if max_age is None:
-                age_condition = "(strftime('%m', 'now') + 12 * strftime('%Y', 'now')) - (strftime('%m', account_created) + 12 * strftime('%Y', account_created)) >= ?"
-                params = (min_age,)
-            else:
-                age_condition = "(strftime('%m', 'now') + 12 * strftime('%Y', 'now')) - (strftime('%m', account_created) + 12 * strftime('%Y', account_created)) >= ? AND (strftime('%m', 'now') + 12 * strftime('%Y', 'now')) - (strftime('%m', account_created) + 12 * strftime('%Y', account_created)) < ?"
-                params = (min_age, max_age)
-            
-            query = f"""
-                SELECT 
-                    COUNT(DISTINCT ru.id) as user_count,
-                    COUNT(rp.id) as post_count,
-                    AVG(rp.trump_sentiment) as avg_sentiment
-                FROM reddit_users ru
-                JOIN reddit_posts rp ON ru.user_id = rp.account_id
-                WHERE {age_condition}
-                AND rp.trump_sentiment IS NOT NULL
-            """
-            
-            cur.execute(query, params)
-            user_count, post_count, avg_sentiment = cur.fetchone()
-            
-            if max_age is None:
-                range_label = f"{min_age}+ months"
-            else:
-                range_label = f"{min_age}-{max_age} months"
-            
-            if user_count > 0: 
-                results.append({
-                    "account_age_range": range_label,
-                    "avg_sentiment": round(avg_sentiment, 2) if avg_sentiment else None
-                })
+        if own_conn:
+            conn = sqlite3.connect(db_path)
+        results, distributions = account_age_summaries(conn, target, approximate, start, end)
         
-        output_path = Path(__file__).parent.parent.parent / 'data' / 'account_age_sentiment.json'
+        suffix = '' if target is None else f'_{target}'
+        output_path = Path(__file__).parent.parent.parent / 'data' / f'account_age_sentiment{suffix}.json'
         with open(output_path, 'w') as f:
             json.dump(results, f, indent=2)
+        distribution_path = output_path.with_name(f'account_age_sentiment_distribution{suffix}.json')
+        with open(distribution_path, 'w') as f:
+            json.dump(distributions, f, indent=2)
         
         print(f"Analysis complete. Results saved to {output_path}")
         print("\nAccount Age Analysis (in months):")
         for result in results:
             print(f"\nAccount Age Range: {result['account_age_range']}")
             print(f"Average Sentiment: {result['avg_sentiment']}")
+            print(f"Median Sentiment: {result['p50']} (p10 {result['p10']}, p90 {result['p90']})")
+            if result['estimate'] == 'approximate':
+                print(f"95% CI: {result['ci_low']} - {result['ci_high']}")
         
     except sqlite3.Error as e:
         print(f"Database error: {e}")
     except Exception as e:
         print(f"Error: {e}")
     finally:
-        if 'conn' in locals():
+        if own_conn and conn is not None:
             conn.close()
 
 if __name__ == "__main__":
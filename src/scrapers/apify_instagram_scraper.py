@@ -7,13 +7,49 @@ import time
 import json
 import random
 
-class InstagramScraper:
-    def __init__(self, db_path='data/project.db'):
+from src.processing.sampling import record_sample
+from src.scrapers.streaming import DatasetIngestMixin, batched, pause
+
+class InstagramRecord:
+    """Compact holder for the dataset item fields we insert"""
+    __slots__ = ('post_id', 'username', 'caption', 'timestamp', 'likes_count', 'comments_count', 'url')
+
+    def __init__(self, post_id, username, caption, timestamp, likes_count, comments_count, url):
+        self.post_id = post_id
+        self.username = username
+        self.caption = caption
+        self.timestamp = timestamp
+        self.likes_count = likes_count
+        self.comments_count = comments_count
+        self.url = url
+
+    @classmethod
+    def from_item(cls, item):
+        return cls(
+            item.get('id'),
+            item.get('ownerFullName'),
+            item.get('caption', ''),
+            item.get('timestamp'),
+            item.get('likesCount', 0),
+            item.get('commentsCount', 0),
+            item.get('url', '')
+        )
+
+class InstagramScraper(DatasetIngestMixin):
+    table = 'instagram_posts'
+    key_column = 'post_id'
+    record_class = InstagramRecord
+
+    def __init__(self, db_path='data/project.db', pipeline=None, shards=None, stop=None):
         load_dotenv()
         self.api_key = os.getenv('APIFY_API_KEY')
         self.db_path = db_path
         self.conn = sqlite3.connect(db_path)
         self.cur = self.conn.cursor()
+        self.pipeline = pipeline
+        self.shards = shards
+        # threading.Event that cuts a scrape short; what was inserted is still committed
+        self.stop = stop
         
         sqlite3.register_adapter(datetime, lambda dt: dt.isoformat())
 
@@ -28,7 +64,33 @@ class InstagramScraper:
         except:
             return datetime.now()
 
-    def scrape_hashtag_posts(self, hashtag="trump", api_limit=150, db_limit=25):
+    def insert_post(self, record):
+        """
+        Insert one InstagramRecord into instagram_posts, in the main
+        database or the shard for its month. Returns True.
+        """
+        post_date = self.convert_timestamp(record.timestamp)
+        cur = self.shards.cursor_for(post_date) if self.shards else self.cur
+        cur.execute('''
+            INSERT INTO instagram_posts 
+            (post_id, username, caption, post_date, likes_count, comments_count, url)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        ''', (
+            record.post_id,
+            record.username,
+            record.caption,
+            post_date,
+            record.likes_count,
+            record.comments_count,
+            record.url
+        ))
+        post_id = cur.lastrowid
+        record_sample(cur, 'instagram_posts', post_id)
+        if self.pipeline:
+            self.pipeline.score(cur, 'instagram_posts', post_id, record.caption)
+        return True
+
+    def scrape_hashtag_posts(self, hashtag="trump", api_limit=150, db_limit=25, stream=False):
         """
         Scrape Instagram posts using Apify Instagram Hashtag Scraper
         
@@ -36,6 +98,8 @@ class InstagramScraper:
             hashtag: Hashtag to search for
             api_limit: Number of results to fetch from API (default: 150)
             db_limit: Maximum number of new posts to add to database (default: 25)
+            stream: Read the dataset as JSONL and reservoir-sample it instead
+                    of loading the whole response into memory (default: False)
         """
         url = "https://api.apify.com/v2/actor-tasks"
         headers = {
@@ -65,6 +129,10 @@ class InstagramScraper:
             run_response = requests.post(run_url)
             run_response.raise_for_status()
             run_id = run_response.json()["data"]["id"]
+
+            if stream:
+                self.ingest_stream(run_id, db_limit)
+                return
             
             dataset_url = f"https://api.apify.com/v2/actor-runs/{run_id}/dataset/items?token={self.api_key}"
             items = []
@@ -90,7 +158,9 @@ class InstagramScraper:
                                 print("No new items found in last 5 attempts, proceeding with current results")
                                 break
                 
-                time.sleep(5)  
+                if pause(5, self.stop):
+                    print("Stopped while waiting for results")
+                    return
                 attempt += 1
                 print(f"Waiting for results... attempt {attempt}/{max_attempts}")
 
@@ -105,36 +175,25 @@ class InstagramScraper:
             processed_posts = 0
 
             random.shuffle(items)
+            stored = set()
+            for batch in batched(item.get('id') for item in items):
+                stored |= self.stored_keys(batch)
 
             # Keep trying until we either add enough posts or run out of posts to check
-            while new_posts_count < db_limit and processed_posts < len(items):
+            while new_posts_count < db_limit and processed_posts < len(items) and not self.stopping():
                 item = items[processed_posts]
                 processed_posts += 1
 
                 try:
                     # Check if post already exists
-                    self.cur.execute('''
-                        SELECT id FROM instagram_posts WHERE post_id = ?
-                    ''', (item.get('id'),))
-                    if self.cur.fetchone():
+                    if item.get('id') in stored:
                         print(f"Skipping duplicate post {item.get('id')}")
                         skipped_posts += 1
                         continue
 
                     # Insert Instagram post data
-                    self.cur.execute('''
-                        INSERT INTO instagram_posts 
-                        (post_id, username, caption, post_date, likes_count, comments_count, url)
-                        VALUES (?, ?, ?, ?, ?, ?, ?)
-                    ''', (
-                        item.get('id'),
-                        item.get('ownerFullName'),
-                        item.get('caption', ''),
-                        self.convert_timestamp(item.get('timestamp')),
-                        item.get('likesCount', 0),
-                        item.get('commentsCount', 0),
-                        item.get('url', '')
-                    ))
+                    self.insert_post(InstagramRecord.from_item(item))
+                    stored.add(item.get('id'))
                     new_posts_count += 1
                     print(f"Added new post from {item.get('ownerFullName')}")
 
@@ -144,7 +203,7 @@ class InstagramScraper:
                     error_posts += 1
                     continue
 
-            self.conn.commit()
+            self.commit()
             print(f"\nScraping Summary:")
             print(f"Total items from API: {len(items)}")
             print(f"Processed posts: {processed_posts}")
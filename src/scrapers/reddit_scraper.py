@@ -7,13 +7,48 @@ import time
 import json
 import random
 
-class ApifyRedditScraper:
-    def __init__(self, db_path='data/project.db'):
+from src.processing.sampling import record_sample
+from src.scrapers.streaming import DatasetIngestMixin, batched, pause
+
+class RedditRecord:
+    """Compact holder for the dataset item fields we insert"""
+    __slots__ = ('account_id', 'username', 'created_at', 'text_content', 'subreddit', 'upvotes')
+
+    def __init__(self, account_id, username, created_at, text_content, subreddit, upvotes):
+        self.account_id = account_id
+        self.username = username
+        self.created_at = created_at
+        self.text_content = text_content
+        self.subreddit = subreddit
+        self.upvotes = upvotes
+
+    @classmethod
+    def from_item(cls, item):
+        text_content = f"{item.get('title', '')}\n{item.get('body', '')}"
+        return cls(
+            item.get('userId'),
+            item.get('username'),
+            item.get('createdAt'),
+            text_content.strip(),
+            item.get('parsedCommunityName'),
+            item.get('upVotes', 0)
+        )
+
+class ApifyRedditScraper(DatasetIngestMixin):
+    table = 'reddit_posts'
+    key_column = 'account_id'
+    record_class = RedditRecord
+
+    def __init__(self, db_path='data/project.db', pipeline=None, shards=None, stop=None):
         load_dotenv()
         self.api_key = os.getenv('APIFY_API_KEY')
         self.db_path = db_path
         self.conn = sqlite3.connect(db_path)
         self.cur = self.conn.cursor()
+        self.pipeline = pipeline
+        self.shards = shards
+        # threading.Event that cuts a scrape short; what was inserted is still committed
+        self.stop = stop
         
         sqlite3.register_adapter(datetime, lambda dt: dt.isoformat())
 
@@ -28,7 +63,60 @@ class ApifyRedditScraper:
         except:
             return datetime.now()
 
-    def scrape_posts(self, search_term="Donald Trump", api_limit=150, db_limit=25):
+    def insert_post(self, record):
+        """
+        Insert one RedditRecord and its user. The user goes into the main
+        database, the post into the main database or the shard for its month.
+        Returns False if the user row could not be resolved.
+        """
+        post_date = self.convert_timestamp(record.created_at)
+        # First insert or get the user
+        self.cur.execute('''
+            INSERT OR IGNORE INTO reddit_users 
+            (username, user_id, karma, account_created, is_moderator, is_verified)
+            VALUES (?, ?, ?, ?, ?, ?)
+        ''', (
+            record.username,
+            record.account_id,
+            0,  # Default karma
+            post_date,
+            False,  # Default is_moderator
+            False  # Default is_verified
+        ))
+
+        # Get the user's integer ID
+        self.cur.execute('''
+            SELECT id FROM reddit_users WHERE user_id = ?
+        ''', (record.account_id,))
+        user_row = self.cur.fetchone()
+        if not user_row:
+            print(f"Failed to get user ID for {record.username}")
+            return False
+        user_id = user_row[0]
+
+        # Insert the post with the integer user_id
+        cur = self.shards.cursor_for(post_date) if self.shards else self.cur
+        cur.execute('''
+            INSERT INTO reddit_posts 
+            (user_id, account_id, account_name, post_date, text_content, is_reply, subreddit, upvotes)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        ''', (
+            user_id,
+            record.account_id,
+            record.username,
+            post_date,
+            record.text_content,
+            False,
+            record.subreddit,
+            record.upvotes
+        ))
+        post_id = cur.lastrowid
+        record_sample(cur, 'reddit_posts', post_id)
+        if self.pipeline:
+            self.pipeline.score(cur, 'reddit_posts', post_id, record.text_content)
+        return True
+
+    def scrape_posts(self, search_term="Donald Trump", api_limit=150, db_limit=25, stream=False):
         """
         Scrape posts using Apify Reddit Scraper Lite
         
@@ -36,6 +124,8 @@ class ApifyRedditScraper:
             search_term: Term to search for
             api_limit: Number of results to fetch from API (default: 150)
             db_limit: Maximum number of new posts to add to database (default: 25)
+            stream: Read the dataset as JSONL and reservoir-sample it instead
+                    of loading the whole response into memory (default: False)
         """
         url = "https://api.apify.com/v2/actor-tasks"
         headers = {
@@ -68,6 +158,10 @@ class ApifyRedditScraper:
             run_response = requests.post(run_url)
             run_response.raise_for_status()
             run_id = run_response.json()["data"]["id"]
+
+            if stream:
+                self.ingest_stream(run_id, db_limit)
+                return
             
             dataset_url = f"https://api.apify.com/v2/actor-runs/{run_id}/dataset/items?token={self.api_key}"
             items = []
@@ -93,7 +187,9 @@ class ApifyRedditScraper:
                                 print("No new items found in last 5 attempts, proceeding with current results")
                                 break
                 
-                time.sleep(5) 
+                if pause(5, self.stop):
+                    print("Stopped while waiting for results")
+                    return
                 attempt += 1
                 print(f"Waiting for results... attempt {attempt}/{max_attempts}")
 
@@ -108,64 +204,26 @@ class ApifyRedditScraper:
             processed_posts = 0
 
             random.shuffle(items)
+            stored = set()
+            for batch in batched(item.get('userId') for item in items):
+                stored |= self.stored_keys(batch)
 
             # Keep trying until we either add enough posts or run out of posts to check
-            while new_posts_count < db_limit and processed_posts < len(items):
+            while new_posts_count < db_limit and processed_posts < len(items) and not self.stopping():
                 item = items[processed_posts]
                 processed_posts += 1
 
                 try:
                     # Check if post already exists using just the account_id
-                    self.cur.execute('''
-                        SELECT id FROM reddit_posts WHERE account_id = ?
-                    ''', (item.get('userId'),))
-                    if self.cur.fetchone():
+                    if item.get('userId') in stored:
                         print(f"Skipping duplicate post from user {item.get('username')} (ID: {item.get('userId')})")
                         skipped_posts += 1
                         continue
 
-                    # First insert or get the user
-                    self.cur.execute('''
-                        INSERT OR IGNORE INTO reddit_users 
-                        (username, user_id, karma, account_created, is_moderator, is_verified)
-                        VALUES (?, ?, ?, ?, ?, ?)
-                    ''', (
-                        item.get('username'),
-                        item.get('userId'),
-                        0,  # Default karma
-                        self.convert_timestamp(item.get('createdAt')),
-                        False,  # Default is_moderator
-                        False  # Default is_verified
-                    ))
-
-                    # Get the user's integer ID
-                    self.cur.execute('''
-                        SELECT id FROM reddit_users WHERE user_id = ?
-                    ''', (item.get('userId'),))
-                    user_row = self.cur.fetchone()
-                    if not user_row:
-                        print(f"Failed to get user ID for {item.get('username')}")
+                    if not self.insert_post(RedditRecord.from_item(item)):
                         error_posts += 1
                         continue
-                    user_id = user_row[0]
-
-                    text_content = f"{item.get('title', '')}\n{item.get('body', '')}"
-
-                    # Insert the post with the integer user_id
-                    self.cur.execute('''
-                        INSERT INTO reddit_posts 
-                        (user_id, account_id, account_name, post_date, text_content, is_reply, subreddit, upvotes)
-                        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-                    ''', (
-                        user_id,
-                        item.get('userId'),
-                        item.get('username'),
-                        self.convert_timestamp(item.get('createdAt')),
-                        text_content.strip(),
-                        False,
-                        item.get('parsedCommunityName'),
-                        item.get('upVotes', 0)
-                    ))
+                    stored.add(item.get('userId'))
                     new_posts_count += 1
                     print(f"Added new post from {item.get('username')}")
 
@@ -175,7 +233,7 @@ class ApifyRedditScraper:
                     error_posts += 1
                     continue
 
-            self.conn.commit()
+            self.commit()
             print(f"\nScraping Summary:")
             print(f"Total items from API: {len(items)}")
             print(f"Processed posts: {processed_posts}")
@@ -0,0 +1,206 @@
+# src/scrapers/streaming.py
+import json
+import random
+import time
+
+import requests
+
+from src.processing.targets import PLATFORMS
+
+API_BASE = "https://api.apify.com/v2"
+
+# dedup keys looked up in the database per query
+KEY_BATCH_SIZE = 500
+
+
+def pause(seconds, stop=None):
+    """Sleep for seconds, cut short once stop (a threading.Event) is set. Returns whether it is set"""
+    if stop is None:
+        time.sleep(seconds)
+        return False
+    return stop.wait(seconds)
+
+
+def wait_for_dataset(run_id, api_key, max_attempts=60, max_idle_attempts=10, interval=5, stop=None):
+    """
+    Poll the run's default dataset until its item count stops growing.
+
+    Only the dataset metadata is fetched while waiting, so the items
+    themselves are downloaded exactly once by iter_dataset_items.
+    Returns the last item count seen, or 0 if stop is set while waiting.
+    """
+    info_url = f"{API_BASE}/actor-runs/{run_id}/dataset?token={api_key}"
+    item_count = 0
+    no_new_items_count = 0
+    attempt = 0
+
+    while attempt < max_attempts:
+        response = requests.get(info_url)
+        if response.status_code == 200:
+            current_count = response.json()["data"].get("itemCount") or 0
+            if current_count > item_count:
+                item_count = current_count
+                no_new_items_count = 0
+                print(f"Found {item_count} items so far...")
+            elif item_count:
+                no_new_items_count += 1
+                if no_new_items_count >= max_idle_attempts:
+                    print(f"No new items found in last {max_idle_attempts} attempts, proceeding with current results")
+                    break
+
+        if pause(interval, stop):
+            print("Stopped while waiting for results")
+            return 0
+        attempt += 1
+        print(f"Waiting for results... attempt {attempt}/{max_attempts}")
+
+    return item_count
+
+
+def iter_dataset_items(run_id, api_key, chunk_size=64 * 1024):
+    """
+    Yield dataset items one at a time from a JSONL response.
+
+    The response body is read in chunks, so only the current line is
+    held in memory instead of the whole JSON array.
+    """
+    items_url = f"{API_BASE}/actor-runs/{run_id}/dataset/items?token={api_key}&format=jsonl&clean=true"
+    with requests.get(items_url, stream=True) as response:
+        response.raise_for_status()
+        for line in response.iter_lines(chunk_size=chunk_size):
+            if not line:
+                continue
+            try:
+                yield json.loads(line)
+            except ValueError as e:
+                print(f"Skipping malformed dataset line: {e}")
+
+
+def reservoir_sample(records, k, rng=random):
+    """
+    Pick a uniform random sample of k records from an iterable of unknown length.
+
+    Returns (sample, total_seen). Memory use is bounded by k.
+    """
+    sample = []
+    seen = 0
+    for record in records:
+        seen += 1
+        if len(sample) < k:
+            sample.append(record)
+        else:
+            j = rng.randrange(seen)
+            if j < k:
+                sample[j] = record
+    rng.shuffle(sample)
+    return sample, seen
+
+
+def batched(iterable, size=KEY_BATCH_SIZE):
+    """Yield lists of up to size consecutive items from iterable"""
+    batch = []
+    for item in iterable:
+        batch.append(item)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+class DatasetIngestMixin:
+    """
+    Dedup, stream ingestion and commit logic shared by the Apify scrapers.
+
+    Subclasses set table, key_column (the dedup column, also the record
+    attribute holding it) and record_class (with a from_item classmethod),
+    and provide api_key, conn, cur, shards, stop and
+    insert_post(record), which returns whether the post was inserted.
+    """
+    table = None
+    key_column = None
+    record_class = None
+
+    def ingest_stream(self, run_id, db_limit):
+        """
+        Stream the run's dataset and insert a random sample of db_limit new posts.
+
+        Posts already stored (or already seen in the stream) are filtered
+        while streaming, so the sample only holds posts that will actually
+        be inserted.
+        """
+        if not wait_for_dataset(run_id, self.api_key, stop=self.stop):
+            if not self.stopping():
+                print("No results found after maximum attempts")
+            return
+
+        seen = set()
+        skipped_posts = 0
+
+        def fresh_records():
+            nonlocal skipped_posts
+            records = (self.record_class.from_item(item) for item in iter_dataset_items(run_id, self.api_key))
+            for batch in batched(records):
+                if self.stopping():
+                    break
+                stored = self.stored_keys([getattr(record, self.key_column) for record in batch])
+                for record in batch:
+                    key = getattr(record, self.key_column)
+                    if key in stored or key in seen:
+                        skipped_posts += 1
+                        continue
+                    seen.add(key)
+                    yield record
+
+        sample, fresh_count = reservoir_sample(fresh_records(), db_limit)
+        new_posts_count = 0
+        error_posts = 0
+
+        for record in sample:
+            if self.stopping():
+                break
+            try:
+                if not self.insert_post(record):
+                    error_posts += 1
+                    continue
+                new_posts_count += 1
+                print(f"Added new post from {record.username}")
+            except Exception as e:
+                print(f"Error processing item: {e}")
+                print(f"Problematic item: {getattr(record, self.key_column)}")
+                error_posts += 1
+
+        self.commit()
+        print(f"\nScraping Summary:")
+        print(f"Total items from API: {fresh_count + skipped_posts}")
+        print(f"Sampled posts: {len(sample)}")
+        print(f"New posts added: {new_posts_count}")
+        print(f"Skipped (duplicate) posts: {skipped_posts}")
+        print(f"Error posts: {error_posts}")
+
+    def stored_keys(self, keys):
+        """
+        The keys among keys already stored, in the main database, any shard
+        or the archive. Only these keys are looked up, so pass at most
+        KEY_BATCH_SIZE at a time.
+        """
+        placeholders = ', '.join('?' * len(keys))
+        self.cur.execute(f'''
+            SELECT {self.key_column} FROM {self.table} WHERE {self.key_column} IN ({placeholders})
+            UNION
+            SELECT key FROM archived_keys WHERE platform = ? AND key IN ({placeholders})
+        ''', (*keys, PLATFORMS[self.table], *keys))
+        stored = {row[0] for row in self.cur.fetchall()}
+        if self.shards:
+            stored |= self.shards.existing_keys(self.table, self.key_column, keys)
+        return stored
+
+    def stopping(self):
+        """Whether the stop event is set"""
+        return self.stop is not None and self.stop.is_set()
+
+    def commit(self):
+        """Commit the inserts (and their scores) to the main database and every shard touched"""
+        if self.shards:
+            self.shards.commit()
+        self.conn.commit()
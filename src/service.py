@@ -0,0 +1,256 @@
+# src/service.py
+"""
+Read-only HTTP service for the sentiment aggregates.
+
+    python -m src.service --port 8000
+
+Endpoints (all GET, JSON):
+    /weekday      by platform and weekday
+    /trend        by time bucket (bucket=day|week|month|year, default month)
+    /account-age  by Reddit account age range
+
+Filters: platform=reddit|instagram (repeatable), start/end=YYYY-MM-DD,
+target=<name>, approximate=1.
+
+Results are cached per query until the database files change, and every
+response carries an ETag so polling clients get a 304 when nothing moved.
+"""
+from __future__ import annotations
+import argparse
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+from collections import OrderedDict
+from datetime import date
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Any, Callable
+from urllib.parse import parse_qs, urlsplit
+
+from src.processing.process_data import BUCKETS, DB_PATH, load_groups, summarize
+from src.processing.targets import PLATFORMS
+from src.processing.user_age_analysis import account_age_summaries
+from src.shards import SHARD_DIR, list_shards
+
+CACHE_SIZE: int = 256
+
+
+class QueryError(ValueError):
+    """Bad request parameters; reported to the client as a 400."""
+
+
+def change_counter(path: Path) -> int | None:
+    """
+    File change counter from a SQLite database header (bytes 24-27), which
+    every committed transaction increments; None if the file is missing.
+    """
+    try:
+        with open(path, "rb") as f:
+            f.seek(24)
+            header = f.read(4)
+    except FileNotFoundError:
+        return None
+    return int.from_bytes(header, "big") if len(header) == 4 else 0
+
+
+def write_watermark() -> tuple[tuple[str, int, int, int], ...]:
+    """
+    Cheap fingerprint of every database file: the header change counter
+    of the main database and each shard, plus the size and mtime of its
+    WAL, since commits in WAL mode only reach the header at a checkpoint.
+    Any committed write changes it.
+    """
+    paths = [DB_PATH] + [path for _, path in list_shards(shard_dir=SHARD_DIR)]
+    stamp = []
+    for path in paths:
+        counter = change_counter(path)
+        if counter is None:
+            continue
+        try:
+            wal = os.stat(path.with_name(path.name + "-wal"))
+            wal_stamp = (wal.st_size, wal.st_mtime_ns)
+        except FileNotFoundError:
+            wal_stamp = (0, 0)
+        stamp.append((path.name, counter, *wal_stamp))
+    return tuple(stamp)
+
+
+def connect_read_only() -> sqlite3.Connection:
+    """Read-only connection; query_only also covers attached shards."""
+    conn = sqlite3.connect(f"file:{DB_PATH}?mode=ro", uri=True)
+    conn.execute("PRAGMA query_only = ON")
+    return conn
+
+
+class ResultCache:
+    """LRU of query -> (watermark, body); entries from an older watermark are stale."""
+
+    def __init__(self, size: int = CACHE_SIZE) -> None:
+        self.size = size
+        self.entries: OrderedDict[Any, tuple[Any, bytes]] = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key: Any, watermark: Any) -> bytes | None:
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None or entry[0] != watermark:
+                return None
+            self.entries.move_to_end(key)
+            return entry[1]
+
+    def put(self, key: Any, watermark: Any, body: bytes) -> None:
+        with self.lock:
+            self.entries[key] = (watermark, body)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.size:
+                self.entries.popitem(last=False)
+
+
+# queries
+
+def parse_date(name: str, value: str | None) -> str | None:
+    """A start/end parameter as 'YYYY-MM-DD', or None if absent."""
+    if value is None:
+        return None
+    try:
+        return date.fromisoformat(value).isoformat()
+    except ValueError:
+        raise QueryError(f"Invalid {name} date: {value} (expected YYYY-MM-DD)") from None
+
+
+def parse_filters(params: dict[str, list[str]]) -> dict[str, Any]:
+    """Validate the shared query parameters."""
+    def one(name: str) -> str | None:
+        values = params.get(name)
+        return values[-1] if values else None
+
+    platforms = params.get("platform")
+    if platforms:
+        unknown = set(platforms) - set(PLATFORMS.values())
+        if unknown:
+            raise QueryError(f"Unknown platform: {', '.join(sorted(unknown))}")
+        platforms = sorted(set(platforms))
+    return {
+        "platforms": platforms or None,
+        "start": parse_date("start", one("start")),
+        "end": parse_date("end", one("end")),
+        "target": one("target"),
+        "approximate": one("approximate") in ("1", "true", "yes"),
+        "bucket": one("bucket") or "month",
+    }
+
+
+def query_weekday(conn: sqlite3.Connection, f: dict[str, Any]) -> list[dict[str, Any]]:
+    keys = {"platform": "platform", "weekday": "strftime('%w', post_date)"}
+    groups = load_groups(conn.cursor(), keys, f["target"], f["approximate"],
+                         f["start"], f["end"], f["platforms"])
+    return [
+        {"platform": platform, "weekday": weekday, **summarize(hist, margin)}
+        for (platform, weekday), (hist, margin) in groups.items()
+    ]
+
+
+def query_trend(conn: sqlite3.Connection, f: dict[str, Any]) -> list[dict[str, Any]]:
+    if f["bucket"] not in BUCKETS:
+        raise QueryError(f"Unknown bucket: {f['bucket']} (expected one of {', '.join(BUCKETS)})")
+    keys = {"period": BUCKETS[f["bucket"]]}
+    groups = load_groups(conn.cursor(), keys, f["target"], f["approximate"],
+                         f["start"], f["end"], f["platforms"])
+    return [{"period": period, **summarize(hist, margin)} for (period,), (hist, margin) in groups.items()]
+
+
+def query_account_age(conn: sqlite3.Connection, f: dict[str, Any]) -> list[dict[str, Any]]:
+    if f["platforms"] and f["platforms"] != ["reddit"]:
+        raise QueryError("Account age is only available for reddit")
+    results, _ = account_age_summaries(conn, f["target"], f["approximate"], f["start"], f["end"])
+    return results
+
+
+ROUTES: dict[str, Callable[[sqlite3.Connection, dict[str, Any]], list[dict[str, Any]]]] = {
+    "/weekday": query_weekday,
+    "/trend": query_trend,
+    "/account-age": query_account_age,
+}
+
+
+# HTTP
+
+class AggregateHandler(BaseHTTPRequestHandler):
+    cache = ResultCache()
+
+    def do_GET(self) -> None:
+        url = urlsplit(self.path)
+        route = ROUTES.get(url.path.rstrip("/") or "/")
+        if route is None:
+            self.send_json(404, {"error": f"Unknown endpoint {url.path}", "endpoints": sorted(ROUTES)})
+            return
+        try:
+            filters = parse_filters(parse_qs(url.query))
+        except QueryError as e:
+            self.send_json(400, {"error": str(e)})
+            return
+
+        key = (url.path, tuple(sorted((k, str(v)) for k, v in filters.items())))
+        watermark = write_watermark()
+        etag = '"' + hashlib.sha1(repr((key, watermark)).encode()).hexdigest() + '"'
+        if self.headers.get("If-None-Match") == etag:
+            self.send_response(304)
+            self.send_header("ETag", etag)
+            self.end_headers()
+            return
+
+        body = self.cache.get(key, watermark)
+        if body is None:
+            try:
+                conn = connect_read_only()
+                try:
+                    results = route(conn, filters)
+                finally:
+                    conn.close()
+            except QueryError as e:
+                self.send_json(400, {"error": str(e)})
+                return
+            except sqlite3.Error as e:
+                self.send_json(500, {"error": f"Database error: {e}"})
+                return
+            body = json.dumps({"query": filters, "results": results}, ensure_ascii=False).encode("utf-8")
+            self.cache.put(key, watermark, body)
+
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("ETag", etag)
+        self.send_header("Cache-Control", "no-cache")
+        self.end_headers()
+        self.wfile.write(body)
+
+    def send_json(self, status: int, obj: Any) -> None:
+        body = json.dumps(obj).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def serve(host: str = "127.0.0.1", port: int = 8000) -> None:
+    if not DB_PATH.exists():
+        raise SystemExit(f"Database not found at {DB_PATH}")
+    server = ThreadingHTTPServer((host, port), AggregateHandler)
+    print(f"Serving sentiment aggregates on http://{host}:{port} ({', '.join(sorted(ROUTES))})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve sentiment aggregates over HTTP.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    args = parser.parse_args()
+    serve(args.host, args.port)
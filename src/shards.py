@@ -0,0 +1,130 @@
+# src/shards.py
+from __future__ import annotations
+import re
+import sqlite3
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import Iterator
+
+from src.database_setup import create_post_tables
+
+ROOT_DIR: Path = Path(__file__).resolve().parents[1]
+SHARD_DIR: Path = ROOT_DIR / "data" / "shards"
+
+SHARD_PATTERN = re.compile(r"posts_(\d{4})_(\d{2})\.db$")
+
+
+def shard_month(post_date: datetime | str) -> str:
+    """'YYYY-MM' month a post belongs to."""
+    if isinstance(post_date, datetime):
+        return post_date.strftime("%Y-%m")
+    return str(post_date)[:7]
+
+
+def shard_path(month: str, shard_dir: Path = SHARD_DIR) -> Path:
+    return Path(shard_dir) / f"posts_{month.replace('-', '_')}.db"
+
+
+def schema_name(month: str) -> str:
+    """Name a shard is ATTACHed under."""
+    return f"shard_{month.replace('-', '_')}"
+
+
+def list_shards(start: str | None = None, end: str | None = None,
+                shard_dir: Path = SHARD_DIR) -> list[tuple[str, Path]]:
+    """
+    (month, path) of the shard files overlapping [start, end], oldest first.
+    start/end are 'YYYY-MM' or 'YYYY-MM-DD' strings; None leaves that side open.
+    """
+    shard_dir = Path(shard_dir)
+    if not shard_dir.is_dir():
+        return []
+    shards = []
+    for path in shard_dir.iterdir():
+        match = SHARD_PATTERN.match(path.name)
+        if not match:
+            continue
+        month = f"{match.group(1)}-{match.group(2)}"
+        if start is not None and month < start[:7]:
+            continue
+        if end is not None and month > end[:7]:
+            continue
+        shards.append((month, path))
+    return sorted(shards)
+
+
+@contextmanager
+def attached(conn: sqlite3.Connection, path: Path, name: str) -> Iterator[str]:
+    """ATTACH a shard file for the duration of the block."""
+    conn.execute(f"ATTACH DATABASE ? AS {name}", (str(path),))
+    try:
+        yield name
+    finally:
+        conn.execute(f"DETACH DATABASE {name}")
+
+
+def iter_schemas(conn: sqlite3.Connection, start: str | None = None, end: str | None = None,
+                 shard_dir: Path = SHARD_DIR) -> Iterator[str]:
+    """
+    Yield 'main' and then the schema of every shard in [start, end].
+
+    Shards are attached one at a time and detached before the next one,
+    so any number of months stays under SQLite's ATTACH limit. Callers
+    must finish their queries on a schema before asking for the next.
+    """
+    yield "main"
+    for month, path in list_shards(start, end, shard_dir):
+        with attached(conn, path, schema_name(month)) as name:
+            yield name
+
+
+class ShardRouter:
+    """
+    Routes inserted posts to per-month shard files by post_date.
+    Keeps one connection per shard touched during a run.
+    """
+
+    def __init__(self, shard_dir: Path = SHARD_DIR) -> None:
+        self.shard_dir = Path(shard_dir)
+        self.connections: dict[str, sqlite3.Connection] = {}
+
+    def cursor_for(self, post_date: datetime | str) -> sqlite3.Cursor:
+        """Cursor on the shard holding post_date, creating the shard if needed."""
+        month = shard_month(post_date)
+        conn = self.connections.get(month)
+        if conn is None:
+            self.shard_dir.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(shard_path(month, self.shard_dir))
+            create_post_tables(conn.cursor())
+            self.connections[month] = conn
+        return conn.cursor()
+
+    def existing_keys(self, table: str, column: str, keys: list) -> set:
+        """
+        The values among keys found in table.column of any shard file.
+        Each shard is queried for just these keys through its index on
+        the column, so keep keys under SQLite's host parameter limit.
+        """
+        found = set()
+        if not keys:
+            return found
+        placeholders = ", ".join("?" * len(keys))
+        for month, path in list_shards(shard_dir=self.shard_dir):
+            conn = self.connections.get(month) or sqlite3.connect(path)
+            try:
+                found.update(row[0] for row in conn.execute(
+                    f"SELECT {column} FROM {table} WHERE {column} IN ({placeholders})", keys))
+            finally:
+                if month not in self.connections:
+                    conn.close()
+        return found
+
+    def commit(self) -> None:
+        for conn in self.connections.values():
+            conn.commit()
+
+    def close(self) -> None:
+        for conn in self.connections.values():
+            conn.close()
+        self.connections.clear()
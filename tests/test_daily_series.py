@@ -0,0 +1,76 @@
+# tests/test_daily_series.py
+"""Daily series with rolling averages, exact and from the sample, and its downsampling."""
+import random
+import sqlite3
+
+import pytest
+
+from src.database_setup import create_post_tables
+from src.processing import process_data
+from src.processing.sampling import record_sample
+
+
+@pytest.fixture
+def cur(monkeypatch):
+    """
+    Reddit posts on every day of January 2025 scored 80 and of February
+    scored 20, 20 a day, sampled 200 per month; shards are left out.
+    """
+    monkeypatch.setattr(process_data, "iter_schemas", lambda conn, *args, **kwargs: iter(["main"]))
+    conn = sqlite3.connect(":memory:")
+    cur = conn.cursor()
+    create_post_tables(cur)
+    rng = random.Random(11)
+    for month, days, score in (("01", 31, 80), ("02", 28, 20)):
+        for day in range(1, days + 1):
+            for i in range(20):
+                cur.execute("""
+                    INSERT INTO reddit_posts
+                    (user_id, account_id, account_name, post_date, text_content, is_reply, trump_sentiment)
+                    VALUES (1, ?, 'user', ?, 'text', 0, ?)
+                """, (f"{month}-{day}-{i}", f"2025-{month}-{day:02d} 12:00:00", score))
+                record_sample(cur, "reddit_posts", cur.lastrowid, rng=rng)
+    conn.commit()
+    yield cur
+    conn.close()
+
+
+def test_exact_daily_series(cur):
+    series = process_data.daily_series(cur, windows=(7,))
+    assert len(series) == 59
+    first_feb = next(point for point in series if point["day"] == "2025-02-01")
+    assert first_feb == {"day": "2025-02-01", "avg_sentiment": 20.0, "posts": 20,
+                         "estimate": "exact", "ci_low": None, "ci_high": None,
+                         "rolling_7": round((6 * 80 + 20) / 7, 2)}
+
+
+def test_approximate_daily_series(cur):
+    series = process_data.daily_series(cur, approximate=True, start="2025-01-15", windows=(30,))
+    assert series and all(point["estimate"] == "approximate" for point in series)
+    assert all(point["day"] >= "2025-01-15" for point in series)
+    for point in series:
+        # every post in a month has the same score, so each day's estimate is exact
+        assert point["avg_sentiment"] == (80.0 if point["day"] < "2025-02" else 20.0)
+        assert point["ci_low"] <= point["avg_sentiment"] <= point["ci_high"]
+    # about 17 January days and all of February
+    assert sum(point["posts"] for point in series) == pytest.approx(17 * 20 + 28 * 20, rel=0.1)
+    assert series[-1]["rolling_30"] == pytest.approx((2 * 80 + 28 * 20) / 30, abs=1)
+
+    # over whole months the estimated counts add up to the populations
+    series = process_data.daily_series(cur, approximate=True)
+    assert sum(point["posts"] for point in series) == pytest.approx((31 + 28) * 20)
+
+
+def test_lttb_keeps_endpoints_and_peaks():
+    pytest.importorskip("matplotlib")
+    from visuals.plot_sentiment import lttb
+
+    xs = list(range(100))
+    ys = [50.0] * 100
+    ys[37], ys[71] = 95.0, 5.0
+    out_x, out_y = lttb(xs, ys, 10)
+    assert len(out_x) == len(out_y) == 10
+    assert out_x[0] == 0 and out_x[-1] == 99
+    assert out_x == sorted(out_x)
+    assert 37 in out_x and 71 in out_x
+    assert lttb(xs[:5], ys[:5], 10) == (xs[:5], ys[:5])
@@ -0,0 +1,36 @@
+# tests/test_histogram.py
+"""Mean and quantiles read off the 101-bin score histogram."""
+import pytest
+
+from src.processing.histogram import Histogram
+
+
+def test_histogram_quantiles_and_mean():
+    hist = Histogram()
+    hist.add(10)
+    hist.add(20)
+    hist.add(30, 2)
+    assert hist.total == 4
+    assert hist.mean() == 22.5
+    assert hist.summary() == {"avg_sentiment": 22.5, "p10": 10, "p50": 20, "p90": 30}
+
+
+def test_histogram_clamps_and_weights():
+    hist = Histogram()
+    hist.add(-5, 0.5)
+    hist.add(150, 1.5)
+    assert hist.counts[0] == 0.5 and hist.counts[100] == 1.5
+    assert hist.quantile(0.25) == 0
+    assert hist.quantile(0.5) == 100
+    assert hist.mean() == 75
+
+
+def test_histogram_merge_and_empty():
+    assert Histogram().summary() == {"avg_sentiment": None, "p10": None, "p50": None, "p90": None}
+    left, right = Histogram(), Histogram()
+    left.add(40)
+    right.add(60, 3)
+    left.merge(right)
+    assert left.total == 4 and left.mean() == 55
+    with pytest.raises(ValueError):
+        Histogram([1, 2, 3])
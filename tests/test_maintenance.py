@@ -0,0 +1,142 @@
+# tests/test_maintenance.py
+"""Archival keeps every aggregate, and maintenance survives read-only shards."""
+import os
+import sqlite3
+from datetime import date
+from functools import partial
+
+import pytest
+
+from src import maintenance
+from src.database_setup import create_tables
+from src.processing import process_data, user_age_analysis
+from src.processing.sampling import record_sample
+from src.shards import ShardRouter, iter_schemas, list_shards, schema_name, shard_path
+
+# archived with a one-year retention, except the last month
+MONTHS = ["2023-01", "2023-02", "2023-03"]
+
+
+def insert_posts(cur, month, account_id):
+    for day, score in ((3, -2), (10, 1), (17, 4)):
+        post_date = f"{month}-{day:02d} 12:00:00"
+        cur.execute("""
+            INSERT INTO instagram_posts (post_id, username, caption, post_date, trump_sentiment)
+            VALUES (?, 'user', 'text', ?, ?)
+        """, (f"ig-{month}-{day}", post_date, score))
+        record_sample(cur, "instagram_posts", cur.lastrowid)
+        cur.execute("""
+            INSERT INTO reddit_posts (user_id, account_id, account_name, post_date,
+                                      text_content, is_reply, trump_sentiment)
+            VALUES (1, ?, 'user', ?, 'text', 0, ?)
+        """, (account_id, post_date, score + 1))
+        post_id = cur.lastrowid
+        cur.execute("INSERT INTO post_sentiment VALUES ('reddit', ?, 'trump', ?)", (post_id, score))
+        record_sample(cur, "reddit_posts", post_id)
+
+
+@pytest.fixture
+def databases(tmp_path, monkeypatch):
+    """A main database with recent posts and one shard per month in MONTHS."""
+    db_path = tmp_path / "project.db"
+    shard_dir = tmp_path / "shards"
+    monkeypatch.setattr(maintenance, "DB_PATH", db_path)
+    monkeypatch.setattr(maintenance, "ARCHIVE_PATH", tmp_path / "archive.db")
+    monkeypatch.setattr(maintenance, "SHARD_DIR", shard_dir)
+    for module in (process_data, user_age_analysis):
+        monkeypatch.setattr(module, "iter_schemas", partial(iter_schemas, shard_dir=shard_dir))
+
+    create_tables(str(db_path))
+    conn = sqlite3.connect(db_path)
+    conn.execute("""
+        INSERT INTO reddit_users (user_id, username, account_created)
+        VALUES ('t2_user', 'user', '2020-06-01')
+    """)
+    insert_posts(conn.cursor(), f"{date.today():%Y-%m}", "t2_recent")
+    conn.commit()
+    conn.close()
+
+    router = ShardRouter(shard_dir)
+    for month in MONTHS:
+        insert_posts(router.cursor_for(f"{month}-01"), month, "t2_user")
+    router.commit()
+    router.close()
+    return db_path, shard_dir
+
+
+def aggregates(db_path):
+    """Every timed aggregate, with the grouped histograms summarized."""
+    conn = sqlite3.connect(db_path)
+    try:
+        results = {name: query(conn) for name, query in maintenance.TIMED_QUERIES.items()}
+    finally:
+        conn.close()
+    for name in ("weekday", "monthly"):
+        results[name] = {key: process_data.summarize(*group) for key, group in results[name].items()}
+    return results
+
+
+def live_posts(path):
+    conn = sqlite3.connect(path)
+    try:
+        return conn.execute("SELECT COUNT(*) FROM instagram_posts").fetchone()[0]
+    finally:
+        conn.close()
+
+
+def test_aggregates_survive_archival(databases):
+    db_path, shard_dir = databases
+    before = aggregates(db_path)
+
+    report = maintenance.maintain(retention_days=365)
+
+    assert report["archived"] == {schema_name(month): 6 for month in MONTHS}
+    assert report["skipped"] == {}
+    assert all(live_posts(path) == 0 for _, path in list_shards(shard_dir=shard_dir))
+    assert live_posts(db_path) == 3
+    assert aggregates(db_path) == before
+
+    conn = sqlite3.connect(db_path)
+    keys = {row[0] for row in conn.execute("SELECT key FROM archived_keys WHERE platform = 'instagram'")}
+    conn.close()
+    assert keys == {f"ig-{month}-{day}" for month in MONTHS for day in (3, 10, 17)}
+
+
+def test_read_only_shard_is_skipped(databases):
+    db_path, shard_dir = databases
+    before = aggregates(db_path)
+    (_, frozen), *_ = list_shards(shard_dir=shard_dir)
+    frozen.chmod(0o444)
+    try:
+        if os.access(frozen, os.W_OK):
+            pytest.skip("file permissions are not enforced for this user")
+        report = maintenance.maintain(retention_days=365)
+    finally:
+        frozen.chmod(0o644)
+
+    assert report["skipped"] == {schema_name(MONTHS[0]): "read-only"}
+    assert report["archived"] == {schema_name(month): 6 for month in MONTHS[1:]}
+    assert live_posts(frozen) == 3
+    assert aggregates(db_path) == before
+
+
+def test_failing_shard_is_rolled_back(databases, monkeypatch):
+    db_path, shard_dir = databases
+    before = aggregates(db_path)
+    failing = schema_name(MONTHS[1])
+    archive_schema = maintenance.archive_schema
+
+    def archive_or_fail(conn, schema, cutoff):
+        if schema == failing:
+            # fail halfway, so the rollback has something to undo
+            conn.execute(f"DELETE FROM {schema}.instagram_posts")
+            raise sqlite3.OperationalError("attempt to write a readonly database")
+        return archive_schema(conn, schema, cutoff)
+
+    monkeypatch.setattr(maintenance, "archive_schema", archive_or_fail)
+    report = maintenance.maintain(retention_days=365)
+
+    assert report["skipped"] == {failing: "attempt to write a readonly database"}
+    assert report["archived"] == {schema_name(month): 6 for month in MONTHS if month != MONTHS[1]}
+    assert live_posts(shard_path(MONTHS[1], shard_dir)) == 3
+    assert aggregates(db_path) == before
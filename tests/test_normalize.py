@@ -0,0 +1,25 @@
+# tests/test_normalize.py
+"""Known-answer checks for text normalization."""
+import pytest
+
+from src.processing.normalize import normalize_text
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("Terrible night, blame @potus. Trump rally was great!",
+     "Terrible night, blame . Trump rally was great!"),
+    ("See https://example.com/a?b=1. Trump wins!", "See . Trump wins!"),
+    ("(via www.example.com) trump", "(via ) trump"),
+    ("ping @john.doe_1, hi", "ping , hi"),
+    ("mail me at a@b.com", "mail me at a@b.com"),
+    ("#maga #trump #usa #vote #2024 rally", "maga trump usa rally"),
+    ("", ""),
+    (None, None),
+])
+def test_normalize_text(text, expected):
+    assert normalize_text(text) == expected
+
+
+def test_normalize_text_token_limit():
+    assert normalize_text("a b c d", max_tokens=2) == "a b"
+    assert normalize_text("a b c d", max_tokens=None) == "a b c d"
@@ -0,0 +1,57 @@
+# tests/test_pipeline.py
+"""Pipelined scoring: posts are stored already scored, in main and shard files."""
+import sqlite3
+
+import pytest
+
+pytest.importorskip("requests")
+pytest.importorskip("dotenv")
+pytest.importorskip("textblob")
+
+from src.database_setup import create_tables
+from src.processing.pipeline import ScoringPipeline
+from src.processing.sentiment_analyzer import SentimentAnalyzer
+from src.scrapers import streaming
+from src.scrapers.apify_instagram_scraper import InstagramScraper
+from src.shards import ShardRouter, shard_path
+
+
+def test_pipelined_posts_are_committed_scored(tmp_path, monkeypatch):
+    db_path = str(tmp_path / "project.db")
+    create_tables(db_path)
+    items = [
+        {"id": "jan", "ownerFullName": "user", "caption": "Trump rally was great.",
+         "timestamp": "2025-01-10T10:00:00Z"},
+        {"id": "feb", "ownerFullName": "user", "caption": "Awful weather today.",
+         "timestamp": "2025-02-10T10:00:00Z"},
+    ]
+    monkeypatch.setattr(streaming, "wait_for_dataset", lambda run_id, api_key, stop=None: len(items))
+    monkeypatch.setattr(streaming, "iter_dataset_items", lambda run_id, api_key: iter(items))
+
+    analyzer = SentimentAnalyzer(db_path=db_path, targets={"trump": ("trump",)})
+    pipeline = ScoringPipeline(analyzer)
+    router = ShardRouter(tmp_path / "shards")
+    scraper = InstagramScraper(db_path=db_path, pipeline=pipeline, shards=router)
+    try:
+        scraper.ingest_stream("run", db_limit=10)
+    finally:
+        scraper.close()
+        router.close()
+        analyzer.close()
+    assert pipeline.scored == 2
+
+    # read back through fresh connections: scores were committed with the inserts
+    for month, post_id, has_target in (("2025-01", "jan", True), ("2025-02", "feb", False)):
+        conn = sqlite3.connect(shard_path(month, tmp_path / "shards"))
+        overall, target = conn.execute("""
+            SELECT p.trump_sentiment, s.score
+            FROM instagram_posts p
+            LEFT JOIN post_sentiment s ON s.platform = 'instagram' AND s.post_id = p.id AND s.target = 'trump'
+            WHERE p.post_id = ?
+        """, (post_id,)).fetchone()
+        conn.close()
+        assert overall is not None
+        assert (target is not None) == has_target
+    conn = sqlite3.connect(db_path)
+    assert conn.execute("SELECT COUNT(*) FROM instagram_posts").fetchone() == (0,)
+    conn.close()
@@ -0,0 +1,89 @@
+# tests/test_priority.py
+"""Backlog scoring in engagement/recency order under a row or time budget."""
+import sqlite3
+import threading
+from datetime import datetime, timedelta
+
+import pytest
+
+pytest.importorskip("dotenv")
+pytest.importorskip("textblob")
+
+from src.database_setup import create_post_tables
+from src.processing.priority import PriorityScheduler, priority
+from src.processing.sentiment_analyzer import SentimentAnalyzer
+
+# post_id -> (upvotes, age in days)
+POSTS = {
+    "fresh-viral": (5000, 0.5),
+    "fresh-quiet": (0, 1),
+    "week-old-popular": (200, 6),
+    "month-old-viral": (5000, 30),
+    "year-old": (10, 365),
+}
+
+
+@pytest.fixture
+def analyzer(tmp_path):
+    db_path = str(tmp_path / "project.db")
+    conn = sqlite3.connect(db_path)
+    create_post_tables(conn.cursor())
+    now = datetime.now()
+    for key, (upvotes, age) in POSTS.items():
+        conn.execute("""
+            INSERT INTO reddit_posts
+            (user_id, account_id, account_name, post_date, text_content, is_reply, upvotes)
+            VALUES (1, ?, 'user', ?, 'Trump spoke.', 0, ?)
+        """, (key, (now - timedelta(days=age)).isoformat(sep=" "), upvotes))
+    conn.commit()
+    conn.close()
+    analyzer = SentimentAnalyzer(db_path=db_path, targets={"trump": ("trump",)})
+    yield analyzer
+    analyzer.close()
+
+
+def scored_keys(analyzer):
+    rows = analyzer.conn.execute("SELECT account_id FROM reddit_posts WHERE trump_sentiment IS NOT NULL")
+    return {key for (key,) in rows}
+
+
+def test_priority_ranks_engagement_and_recency():
+    assert priority(100, 1) > priority(0, 1) > priority(0, 30)
+    assert priority(10, 0, half_life=7) == pytest.approx(2 * priority(10, 7, half_life=7))
+    assert priority(10, None) == 0.0
+
+
+def test_run_scores_best_first_within_row_budget(analyzer, tmp_path):
+    scheduler = PriorityScheduler(analyzer, shard_dir=tmp_path / "shards")
+    try:
+        before = scheduler.status()["reddit"]
+        # high priority: ranks at least as high as a week-old post with 10 upvotes
+        assert before["pending"] == 5 and before["high_priority"] == 2
+
+        assert scheduler.run(max_rows=1, batch_size=1) == 1
+        assert scored_keys(analyzer) == {"fresh-viral"}
+        after = scheduler.status()["reddit"]
+        assert after["pending"] == 4 and after["high_priority"] == 1
+    finally:
+        scheduler.close()
+
+    scheduler = PriorityScheduler(analyzer, shard_dir=tmp_path / "shards")
+    try:
+        assert scheduler.status()["reddit"]["pending"] == 4
+        assert scheduler.run(batch_size=2) == 4
+        assert scored_keys(analyzer) == set(POSTS)
+        assert scheduler.status()["reddit"] == {"pending": 0, "high_priority": 0, "top_priority": 0.0}
+    finally:
+        scheduler.close()
+
+
+def test_run_stops_on_time_budget_or_stop_event(analyzer, tmp_path):
+    scheduler = PriorityScheduler(analyzer, shard_dir=tmp_path / "shards")
+    try:
+        assert scheduler.run(max_seconds=0) == 0
+        stop = threading.Event()
+        stop.set()
+        assert scheduler.run(stop=stop) == 0
+        assert scored_keys(analyzer) == set()
+    finally:
+        scheduler.close()
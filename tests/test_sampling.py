@@ -0,0 +1,75 @@
+# tests/test_sampling.py
+"""Stratified sample maintained at ingest and the estimates read from it."""
+import random
+import sqlite3
+
+import pytest
+
+from src.database_setup import create_post_tables
+from src.processing import process_data
+from src.processing.sampling import SAMPLE_SIZE, record_sample
+
+
+@pytest.fixture
+def two_months(monkeypatch):
+    """
+    1000 Reddit posts scored 80 spread over January 2025 and 1000 scored 20
+    over February, sampled 200 per month; shards are left out.
+    """
+    monkeypatch.setattr(process_data, "iter_schemas", lambda conn, *args, **kwargs: iter(["main"]))
+    conn = sqlite3.connect(":memory:")
+    cur = conn.cursor()
+    create_post_tables(cur)
+    rng = random.Random(7)
+    for month, days, score in (("01", 31, 80), ("02", 28, 20)):
+        for i in range(1000):
+            cur.execute("""
+                INSERT INTO reddit_posts
+                (user_id, account_id, account_name, post_date, text_content, is_reply, trump_sentiment)
+                VALUES (1, ?, 'user', ?, 'text', 0, ?)
+            """, (f"{month}-{i}", f"2025-{month}-{i % days + 1:02d} 12:00:00", score))
+            record_sample(cur, "reddit_posts", cur.lastrowid, rng=rng)
+    conn.commit()
+    yield cur
+    conn.close()
+
+
+def platform_mean(cur, approximate, start=None, end=None):
+    groups = process_data.load_groups(cur, {"platform": "platform"}, approximate=approximate,
+                                      start=start, end=end)
+    hist, margin = groups[("Reddit",)]
+    return hist.mean(), margin
+
+
+def test_estimate_without_date_range(two_months):
+    exact, margin = platform_mean(two_months, approximate=False)
+    assert exact == 50 and margin is None
+
+    estimate, margin = platform_mean(two_months, approximate=True)
+    assert estimate == pytest.approx(50)
+    assert margin == pytest.approx(0, abs=1e-6)
+
+
+def test_estimate_with_date_range_covers_exact(two_months):
+    # January 26-31 (6 days x 32 posts at 80) and all of February (1000 at 20)
+    exact, _ = platform_mean(two_months, approximate=False, start="2025-01-26")
+    assert exact == pytest.approx((192 * 80 + 1000 * 20) / 1192)
+
+    estimate, margin = platform_mean(two_months, approximate=True, start="2025-01-26")
+    assert margin > 0
+    assert estimate - margin <= exact <= estimate + margin
+
+
+def test_estimate_outside_sample_is_empty(two_months):
+    groups = process_data.load_groups(two_months, {"platform": "platform"}, approximate=True,
+                                      start="2026-01-01")
+    assert groups == {}
+
+
+def test_sample_keeps_capacity_and_population(two_months):
+    strata = two_months.execute(
+        "SELECT platform, month, population FROM sample_strata ORDER BY month").fetchall()
+    assert strata == [("reddit", "2025-01", 1000), ("reddit", "2025-02", 1000)]
+    sizes = two_months.execute(
+        "SELECT month, COUNT(*) FROM sentiment_sample GROUP BY month ORDER BY month").fetchall()
+    assert sizes == [("2025-01", SAMPLE_SIZE), ("2025-02", SAMPLE_SIZE)]
@@ -0,0 +1,54 @@
+# tests/test_sentiment_analyzer.py
+"""Scoring only what a post is missing."""
+import sqlite3
+
+import pytest
+
+pytest.importorskip("dotenv")
+pytest.importorskip("textblob")
+
+from src.database_setup import create_post_tables
+from src.processing.sentiment_analyzer import SentimentAnalyzer
+
+TARGETS = {"trump": ("trump",), "musk": ("musk", "elon")}
+
+
+@pytest.fixture
+def analyzer(tmp_path):
+    db_path = str(tmp_path / "project.db")
+    conn = sqlite3.connect(db_path)
+    create_post_tables(conn.cursor())
+    conn.commit()
+    conn.close()
+    analyzer = SentimentAnalyzer(db_path=db_path, targets=TARGETS)
+    yield analyzer
+    analyzer.close()
+
+
+def test_score_text_with_no_targets_left(analyzer):
+    assert analyzer.score_text("", targets=[]) == (None, {})
+    assert analyzer.score_text("Trump and Musk.", targets=[]) == (None, {})
+    assert analyzer.score_text("") == (50, {"trump": None, "musk": None})
+
+
+def test_score_pending_scores_only_missing_targets(analyzer):
+    overall, target_scores = analyzer.score_pending("Trump spoke. Elon tweeted.", 70, '["trump"]')
+    assert overall is None
+    assert set(target_scores) == {"musk"}
+
+    overall, target_scores = analyzer.score_pending("Trump spoke. Elon tweeted.", None, '["trump"]')
+    assert overall is not None
+    assert set(target_scores) == {"trump", "musk"}
+
+
+def test_save_scores_keeps_stored_overall(analyzer):
+    analyzer.cur.execute("""
+        INSERT INTO instagram_posts (post_id, username, caption, post_date, trump_sentiment)
+        VALUES ('a', 'user', 'Trump spoke.', '2025-01-01', 70)
+    """)
+    post_id = analyzer.cur.lastrowid
+    analyzer.save_scores(analyzer.cur, "instagram_posts", [(post_id, 10, {"musk": None})])
+    row = analyzer.cur.execute("SELECT trump_sentiment FROM instagram_posts WHERE id = ?", (post_id,)).fetchone()
+    assert row == (70,)
+    stored = analyzer.cur.execute("SELECT target, score FROM post_sentiment").fetchall()
+    assert stored == [("musk", None)]
@@ -0,0 +1,101 @@
+# tests/test_service.py
+"""HTTP service: cached results, ETags and invalidation on writes."""
+import json
+import sqlite3
+import threading
+import urllib.error
+import urllib.request
+from functools import partial
+from http.server import ThreadingHTTPServer
+
+import pytest
+
+from src import service
+from src.database_setup import create_post_tables
+from src.processing import process_data
+from src.shards import iter_schemas
+
+
+def add_post(path, score, post_date="2025-01-06 12:00:00"):
+    conn = sqlite3.connect(path)
+    conn.execute("""
+        INSERT INTO instagram_posts (post_id, username, caption, post_date, trump_sentiment)
+        VALUES (?, 'user', 'text', ?, ?)
+    """, (f"{post_date}-{score}", post_date, score))
+    conn.commit()
+    conn.close()
+
+
+@pytest.fixture
+def server(tmp_path, monkeypatch):
+    """The service on a free local port over a temp database without shards."""
+    db_path = tmp_path / "project.db"
+    conn = sqlite3.connect(db_path)
+    create_post_tables(conn.cursor())
+    conn.commit()
+    conn.close()
+    add_post(db_path, 40)
+
+    monkeypatch.setattr(service, "DB_PATH", db_path)
+    monkeypatch.setattr(service, "SHARD_DIR", tmp_path / "shards")
+    monkeypatch.setattr(process_data, "iter_schemas", partial(iter_schemas, shard_dir=tmp_path / "shards"))
+    monkeypatch.setattr(service.AggregateHandler, "cache", service.ResultCache())
+    monkeypatch.setattr(service.AggregateHandler, "log_message", lambda self, *args: None)
+
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), service.AggregateHandler)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{httpd.server_address[1]}", db_path
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def get(url, etag=None):
+    request = urllib.request.Request(url, headers={"If-None-Match": etag} if etag else {})
+    try:
+        with urllib.request.urlopen(request) as response:
+            return response.status, response.headers["ETag"], json.loads(response.read())
+    except urllib.error.HTTPError as e:
+        body = e.read()
+        return e.code, e.headers["ETag"], json.loads(body) if body else None
+
+
+def test_etag_and_invalidation(server):
+    base, db_path = server
+    status, etag, body = get(f"{base}/trend?bucket=month")
+    assert status == 200
+    assert [row["avg_sentiment"] for row in body["results"]] == [40]
+
+    status, same_etag, body = get(f"{base}/trend?bucket=month", etag)
+    assert (status, same_etag, body) == (304, etag, None)
+
+    # a committed write changes the watermark, so the cached result is stale
+    watermark = service.write_watermark()
+    add_post(db_path, 80)
+    assert service.write_watermark() != watermark
+    status, new_etag, body = get(f"{base}/trend?bucket=month", etag)
+    assert status == 200 and new_etag != etag
+    assert [row["avg_sentiment"] for row in body["results"]] == [60]
+
+
+def test_bad_parameters_are_400(server):
+    base, _ = server
+    for query in ("start=yesterday", "end=2025-13-01", "platform=tiktok", "bucket=hour"):
+        status, _, body = get(f"{base}/trend?{query}")
+        assert status == 400 and "error" in body
+    assert get(f"{base}/nope")[0] == 404
+
+
+def test_watermark_covers_wal_commits(tmp_path, monkeypatch):
+    db_path = tmp_path / "project.db"
+    monkeypatch.setattr(service, "DB_PATH", db_path)
+    monkeypatch.setattr(service, "SHARD_DIR", tmp_path / "shards")
+    conn = sqlite3.connect(db_path)
+    conn.execute("PRAGMA journal_mode = WAL")
+    conn.execute("CREATE TABLE t (x)")
+    conn.commit()
+    watermark = service.write_watermark()
+    conn.execute("INSERT INTO t VALUES (1)")
+    conn.commit()
+    assert service.write_watermark() != watermark
+    conn.close()
@@ -0,0 +1,94 @@
+# tests/test_shards.py
+"""Monthly shard routing and aggregates read across ATTACHed shards."""
+import sqlite3
+from functools import partial
+
+import pytest
+
+from src.database_setup import create_post_tables
+from src.processing import process_data
+from src.processing.sampling import record_sample
+from src.shards import ShardRouter, iter_schemas, list_shards
+
+# more months than SQLite's default limit of 10 attached databases
+MONTHS = [f"2024-{m:02d}" for m in range(1, 13)] + ["2025-01", "2025-02"]
+
+
+def insert_post(cur, key, post_date, score):
+    cur.execute("""
+        INSERT INTO instagram_posts (post_id, username, caption, post_date, trump_sentiment)
+        VALUES (?, 'user', 'text', ?, ?)
+    """, (key, post_date, score))
+    record_sample(cur, "instagram_posts", cur.lastrowid)
+
+
+@pytest.fixture
+def sharded(tmp_path, monkeypatch):
+    """
+    A main database with one post and a shard per month in MONTHS, each
+    month's posts scored with the month number, plus the same posts in a
+    single unsharded database.
+    """
+    shard_dir = tmp_path / "shards"
+    monkeypatch.setattr(process_data, "iter_schemas", partial(iter_schemas, shard_dir=shard_dir))
+    main = sqlite3.connect(tmp_path / "project.db")
+    flat = sqlite3.connect(":memory:")
+    for conn in (main, flat):
+        create_post_tables(conn.cursor())
+        insert_post(conn.cursor(), "old", "2023-12-31 09:00:00", 50)
+
+    router = ShardRouter(shard_dir)
+    for month in MONTHS:
+        score = int(month[5:])
+        for day in (1, 15):
+            post_date = f"{month}-{day:02d} 12:00:00"
+            insert_post(router.cursor_for(post_date), f"{month}-{day}", post_date, score)
+            insert_post(flat.cursor(), f"{month}-{day}", post_date, score)
+    router.commit()
+    router.close()
+    main.commit()
+    flat.commit()
+    yield main, flat, shard_dir
+    main.close()
+    flat.close()
+
+
+def test_posts_are_routed_by_month(sharded):
+    _, _, shard_dir = sharded
+    assert [month for month, _ in list_shards(shard_dir=shard_dir)] == MONTHS
+    assert [month for month, _ in list_shards("2024-11-20", "2025-01-05", shard_dir)] == \
+        ["2024-11", "2024-12", "2025-01"]
+    conn = sqlite3.connect(shard_dir / "posts_2024_03.db")
+    assert conn.execute("SELECT post_id FROM instagram_posts ORDER BY id").fetchall() == \
+        [("2024-03-1",), ("2024-03-15",)]
+    conn.close()
+
+    router = ShardRouter(shard_dir)
+    assert router.existing_keys("instagram_posts", "post_id", ["2024-03-1", "2025-02-15", "new"]) == \
+        {"2024-03-1", "2025-02-15"}
+    router.close()
+
+
+def test_sharded_aggregates_match_unsharded(sharded, tmp_path, monkeypatch):
+    main, flat, _ = sharded
+    keys = {"month": process_data.BUCKETS["month"]}
+    for start, end in ((None, None), ("2024-06-10", "2025-01-10")):
+        sharded_groups = process_data.load_groups(main.cursor(), keys, start=start, end=end)
+        with monkeypatch.context() as patch:
+            patch.setattr(process_data, "iter_schemas", partial(iter_schemas, shard_dir=tmp_path / "none"))
+            flat_groups = process_data.load_groups(flat.cursor(), keys, start=start, end=end)
+        assert {key: hist.counts for key, (hist, _) in sharded_groups.items()} == \
+            {key: hist.counts for key, (hist, _) in flat_groups.items()}
+    # the main database's own post is read too, and shards are detached again
+    assert ("2023-12",) in process_data.load_groups(main.cursor(), keys)
+    assert [row[1] for row in main.execute("PRAGMA database_list")] == ["main"]
+
+
+def test_sharded_estimates_use_each_shard_sample(sharded):
+    main, _, _ = sharded
+    groups = process_data.load_groups(main.cursor(), {"month": process_data.BUCKETS["month"]},
+                                      approximate=True)
+    for month in MONTHS:
+        hist, margin = groups[(month,)]
+        assert hist.mean() == pytest.approx(int(month[5:]))
+        assert hist.total == pytest.approx(2)
@@ -0,0 +1,63 @@
+# tests/test_streaming.py
+"""Stream ingestion of Apify datasets: reservoir sampling and dedup."""
+import random
+import sqlite3
+
+import pytest
+
+pytest.importorskip("requests")
+pytest.importorskip("dotenv")
+
+from src.database_setup import create_tables
+from src.scrapers import streaming
+from src.scrapers.apify_instagram_scraper import InstagramScraper
+from src.scrapers.streaming import batched, reservoir_sample
+
+
+def test_reservoir_sample():
+    sample, seen = reservoir_sample(range(3), 5, rng=random.Random(1))
+    assert sorted(sample) == [0, 1, 2] and seen == 3
+
+    hits = [0] * 10
+    rng = random.Random(3)
+    for _ in range(2000):
+        sample, seen = reservoir_sample(range(10), 3, rng=rng)
+        assert seen == 10 and len(set(sample)) == 3
+        for record in sample:
+            hits[record] += 1
+    # every record is kept with probability 3/10: 600 of 2000 runs
+    assert all(500 < count < 700 for count in hits)
+
+
+def test_batched():
+    assert [len(batch) for batch in batched(range(1201))] == [500, 500, 201]
+    assert list(batched([], 3)) == []
+
+
+def test_ingest_stream_skips_stored_and_repeated_keys(tmp_path, monkeypatch):
+    db_path = str(tmp_path / "project.db")
+    create_tables(db_path)
+    conn = sqlite3.connect(db_path)
+    conn.execute("""
+        INSERT INTO instagram_posts (post_id, username, caption, post_date)
+        VALUES ('stored', 'user', 'old post', '2025-01-01')
+    """)
+    conn.execute("INSERT INTO archived_keys (platform, key) VALUES ('instagram', 'archived')")
+    conn.commit()
+
+    items = [
+        {"id": key, "ownerFullName": "user", "caption": f"post {key}", "timestamp": "2025-02-01T10:00:00Z"}
+        for key in ("stored", "archived", "new-1", "new-1", "new-2")
+    ]
+    monkeypatch.setattr(streaming, "wait_for_dataset", lambda run_id, api_key, stop=None: len(items))
+    monkeypatch.setattr(streaming, "iter_dataset_items", lambda run_id, api_key: iter(items))
+
+    scraper = InstagramScraper(db_path=db_path)
+    try:
+        scraper.ingest_stream("run", db_limit=10)
+    finally:
+        scraper.close()
+
+    keys = sorted(row[0] for row in conn.execute("SELECT post_id FROM instagram_posts"))
+    conn.close()
+    assert keys == ["new-1", "new-2", "stored"]
@@ -4,6 +4,7 @@ import csv
 import json
 import math
 import os
+from datetime import date
 from pathlib import Path
 from typing import List, Tuple
 import matplotlib.pyplot as plt
@@ -17,6 +18,11 @@ VIS_DIR = ROOT_DIR / "visuals"
 
 VIS_DIR.mkdir(exist_ok=True)
 
+# daily trend: figure size and the most points drawn per line
+DAILY_FIGSIZE = (12, 5)
+DAILY_DPI = 150
+DAILY_MAX_POINTS = DAILY_FIGSIZE[0] * DAILY_DPI // 2  # ~2 px per point
+
 # helpers 
 def load_csv(path: Path) -> List[Tuple[str, ...]]:
     """
@@ -27,6 +33,40 @@ def load_csv(path: Path) -> List[Tuple[str, ...]]:
         header = next(reader)
         return [tuple(row) for row in reader]
 
+def lttb(xs: List[float], ys: List[float], threshold: int) -> Tuple[List[float], List[float]]:
+    """
+    Largest-Triangle-Three-Buckets downsampling: keeps the first and last
+    points and, from each of threshold - 2 buckets in between, the point
+    forming the largest triangle with the previously kept point and the
+    average of the next bucket. Peaks and dips survive; flat runs thin out.
+    """
+    n = len(xs)
+    if threshold >= n or threshold < 3:
+        return list(xs), list(ys)
+
+    out_x, out_y = [xs[0]], [ys[0]]
+    every = (n - 2) / (threshold - 2)
+    a = 0
+    for i in range(threshold - 2):
+        start = int(i * every) + 1
+        stop = int((i + 1) * every) + 1
+        next_start, next_stop = stop, min(int((i + 2) * every) + 1, n)
+        avg_x = sum(xs[next_start:next_stop]) / (next_stop - next_start)
+        avg_y = sum(ys[next_start:next_stop]) / (next_stop - next_start)
+
+        best, best_area = start, -1.0
+        for j in range(start, stop):
+            area = abs((xs[a] - avg_x) * (ys[j] - ys[a]) - (xs[a] - xs[j]) * (avg_y - ys[a]))
+            if area > best_area:
+                best, best_area = j, area
+        out_x.append(xs[best])
+        out_y.append(ys[best])
+        a = best
+
+    out_x.append(xs[-1])
+    out_y.append(ys[-1])
+    return out_x, out_y
+
 def plot_monthly_trend():
     """
     Creates monthly average sentiment as a line trend.
@@ -54,7 +94,7 @@ def plot_weekday_platform():
     platforms = {row[0] for row in rows}
     weekdays = list(range(7))
     matrix = {plat: [50]*7 for plat in platforms}  # Initialize with neutral sentiment (50)
-    for plat, wd, avg in rows:
+    for plat, wd, avg, *_ in rows:  # extra columns are quantiles
         if avg:  # Only update if avg is not None or empty
             matrix[plat][int(wd)] = float(avg)
 
@@ -111,6 +151,35 @@ def plot_account_age_sentiment():
     fig.savefig(VIS_DIR / "plot3_account_age_sentiment.png", dpi=300, bbox_inches="tight")
     plt.close(fig)
 
+def plot_daily_trend():
+    """
+    Creates the daily average sentiment with its rolling averages.
+    Each line is downsampled with LTTB so the drawn point count stays
+    within the figure's pixel width however many days there are.
+    """
+    data = json.loads((DATA_DIR / "daily_sentiment.json").read_text())
+    if not data:
+        return
+    days = [date.fromisoformat(d["day"]).toordinal() for d in data]
+    windows = sorted(int(k.split("_")[1]) for k in data[0] if k.startswith("rolling_"))
+
+    fig, ax = plt.subplots(figsize=DAILY_FIGSIZE)
+    xs, ys = lttb(days, [d["avg_sentiment"] for d in data], DAILY_MAX_POINTS)
+    ax.plot([date.fromordinal(int(x)) for x in xs], ys, linewidth=0.8, alpha=0.4, label="Daily")
+    for window in windows:
+        xs, ys = lttb(days, [d[f"rolling_{window}"] for d in data], DAILY_MAX_POINTS)
+        ax.plot([date.fromordinal(int(x)) for x in xs], ys, linewidth=2, label=f"{window}-day rolling")
+
+    ax.set_title("Daily Average Trump Sentiment (All Platforms)")
+    ax.set_xlabel("Day")
+    ax.set_ylabel("Average sentiment (0‑100)")
+    ax.axhline(y=50, color='gray', linestyle='--', alpha=0.5)
+    ax.legend(loc="upper left")
+    fig.autofmt_xdate()
+    fig.tight_layout()
+    fig.savefig(VIS_DIR / "plot4_daily_trend.png", dpi=DAILY_DPI)
+    plt.close(fig)
+
 # main
 
 def main():
@@ -118,7 +187,8 @@ def main():
     plot_monthly_trend()
     plot_weekday_platform()
     plot_account_age_sentiment()
-    print("Images saved as plot1_ to plot3_...")
+    plot_daily_trend()
+    print("Images saved as plot1_ to plot4_...")
 
 
 if __name__ == "__main__":